@@ -0,0 +1,78 @@
+import numpy as np
+from geopy.distance import distance
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_matrix(points_from, points_to):
+    """Матрица расстояний в километрах между двумя наборами точек (широта, долгота)."""
+    points_from = np.radians(np.asarray(points_from, dtype=float).reshape(-1, 2))
+    points_to = np.radians(np.asarray(points_to, dtype=float).reshape(-1, 2))
+    lat_from = points_from[:, 0, np.newaxis]
+    lon_from = points_from[:, 1, np.newaxis]
+    lat_to = points_to[np.newaxis, :, 0]
+    lon_to = points_to[np.newaxis, :, 1]
+
+    half_chord = (
+        np.sin((lat_to - lat_from) / 2) ** 2
+        + np.cos(lat_from) * np.cos(lat_to) * np.sin((lon_to - lon_from) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(half_chord, 0, 1)))
+
+
+def get_point(place):
+    if place is None or place.latitude is None or place.longitude is None:
+        return None
+    return float(place.latitude), float(place.longitude)
+
+
+def rank_restaurants(points_of_orders, suitable_restaurants_for_orders, refine_top=0):
+    """Сортирует подходящие рестораны каждого заказа по удалённости.
+
+    `points_of_orders` — словарь {id заказа: (широта, долгота) или None},
+    `suitable_restaurants_for_orders` — {id заказа: список ресторанов}.
+    Возвращает {id заказа: [(ресторан, расстояние в км), ...]}. Для первых
+    `refine_top` ресторанов каждого заказа расстояние уточняется по геодезической.
+    """
+    restaurants = {}
+    for suitable_restaurants in suitable_restaurants_for_orders.values():
+        for restaurant in suitable_restaurants:
+            restaurants.setdefault(restaurant.id, restaurant)
+    restaurants = list(restaurants.values())
+    column_of_restaurant = {
+        restaurant.id: column for column, restaurant in enumerate(restaurants)}
+
+    order_ids = [
+        order_id for order_id, point in points_of_orders.items()
+        if point is not None and suitable_restaurants_for_orders.get(order_id)
+    ]
+    rankings = {order_id: [] for order_id in points_of_orders}
+    if not order_ids or not restaurants:
+        return rankings
+
+    distances = haversine_matrix(
+        [points_of_orders[order_id] for order_id in order_ids],
+        [(float(restaurant.latitude), float(restaurant.longitude)) for restaurant in restaurants],
+    )
+    for row, order_id in enumerate(order_ids):
+        columns = np.fromiter(
+            (column_of_restaurant[restaurant.id]
+             for restaurant in suitable_restaurants_for_orders[order_id]),
+            dtype=np.intp,
+        )
+        order_distances = distances[row, columns]
+        ranking = [
+            (restaurants[columns[position]], float(order_distances[position]))
+            for position in np.argsort(order_distances, kind="stable")
+        ]
+        if refine_top:
+            point = points_of_orders[order_id]
+            refined = [
+                (restaurant, distance(
+                    point, (restaurant.latitude, restaurant.longitude)).km)
+                for restaurant, _ in ranking[:refine_top]
+            ]
+            ranking[:refine_top] = sorted(refined, key=lambda item: item[1])
+        rankings[order_id] = ranking
+    return rankings
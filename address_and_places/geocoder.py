@@ -0,0 +1,357 @@
+import asyncio
+import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Address
+
+
+logger = logging.getLogger(__name__)
+
+FETCH_FAILED = object()
+# Так parse_coordinates падает на ответе, который не похож на ответ геокодера.
+PARSE_ERRORS = (ValueError, KeyError, IndexError, TypeError)
+
+
+class TokenBucket:
+    """Ограничитель частоты запросов: `rate` запросов в секунду, всплеск до `capacity`.
+
+    Потокобезопасен. `reserve` забирает жетон и возвращает, сколько секунд
+    подождать до запроса, — так им пользуются и потоки, и корутины.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+
+class YandexGeocoder:
+    base_url = "https://geocode-maps.yandex.ru/1.x"
+
+    def __init__(self, apikey=None, base_url=None, pool_size=None):
+        self.apikey = apikey or settings.YANDEX_GEOCODER_API_TOKEN
+        if base_url:
+            self.base_url = base_url
+        # Одна сессия на все потоки: соединения с геокодером переиспользуются.
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size or settings.GEOCODER_CONCURRENCY,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get_params(self, address):
+        return {
+            "geocode": address,
+            "apikey": self.apikey,
+            "format": "json",
+        }
+
+    def parse_coordinates(self, response_json):
+        found_places = response_json['response']['GeoObjectCollection']['featureMember']
+
+        if not found_places:
+            return None
+
+        most_relevant = found_places[0]
+        lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
+        return lon, lat
+
+    def fetch_coordinates(self, address):
+        response = self.session.get(
+            self.base_url, params=self.get_params(address),
+            timeout=settings.GEOCODER_TIMEOUT)
+        response.raise_for_status()
+        return self.parse_coordinates(response.json())
+
+    async def afetch_coordinates(self, address, client):
+        response = await client.get(self.base_url, params=self.get_params(address))
+        response.raise_for_status()
+        return self.parse_coordinates(response.json())
+
+
+class StubGeocoder:
+    """Геокодер без сети для тестов и бенчмарков.
+
+    Известные адреса берёт из словаря `places`, остальным выдаёт
+    детерминированные координаты в окрестностях Москвы.
+    """
+
+    def __init__(self, places=None):
+        self.places = places
+
+    def fetch_coordinates(self, address):
+        if self.places is not None:
+            return self.places.get(address)
+        checksum = zlib.crc32(address.encode())
+        lon = 37.3 + (checksum & 0xFFFF) / 0xFFFF * 0.6
+        lat = 55.5 + (checksum >> 16) / 0xFFFF * 0.4
+        return f"{lon:.8f}", f"{lat:.8f}"
+
+    async def afetch_coordinates(self, address, client):
+        return self.fetch_coordinates(address)
+
+
+class GeocodeCache:
+    """Кэш геокодера поверх модели Address.
+
+    Адреса, которые геокодер не нашёл, тоже сохраняются — без координат и
+    со своим сроком жизни, чтобы не запрашивать их на каждой загрузке
+    страницы заказов.
+    """
+
+    def __init__(self, geocoder, ttl, negative_ttl, maxsize=1024, rate_limiter=None):
+        self.geocoder = geocoder
+        self.rate_limiter = rate_limiter
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_fresh(self, place, now=None):
+        if not place.date_of_request:
+            return False
+        now = now or timezone.now()
+        if place.longitude is None or place.latitude is None:
+            return now - place.date_of_request < self.negative_ttl
+        return now - place.date_of_request < self.ttl
+
+    def _get_from_memory(self, address, now):
+        with self._lock:
+            place = self._lru.get(address)
+            if place is None:
+                return None
+            if not self.is_fresh(place, now):
+                del self._lru[address]
+                return None
+            self._lru.move_to_end(address)
+            return place
+
+    def _remember(self, places):
+        with self._lock:
+            for place in places:
+                self._lru[place.address] = place
+                self._lru.move_to_end(place.address)
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+
+    def geocode(self, address):
+        return self.bulk_geocode([address]).get(address)
+
+    def _lookup(self, addresses):
+        """Находит адреса в памяти и в базе.
+
+        Возвращает время запроса, найденные свежие адреса, устаревшие
+        записи из базы и адреса, которые нужно спросить у геокодера.
+        """
+        now = timezone.now()
+        places = {}
+        missing_addresses = set()
+        for address in set(addresses):
+            place = self._get_from_memory(address, now)
+            if place:
+                places[address] = place
+            else:
+                missing_addresses.add(address)
+        if not missing_addresses:
+            return now, places, {}, set()
+
+        stored_places = Address.objects.filter(address__in=missing_addresses)
+        stale_places = {}
+        fresh_places = []
+        for place in stored_places:
+            if self.is_fresh(place, now):
+                fresh_places.append(place)
+                places[place.address] = place
+            else:
+                stale_places[place.address] = place
+        self._remember(fresh_places)
+        return now, places, stale_places, missing_addresses - places.keys()
+
+    def _store(self, now, places, stale_places, coordinates_of_addresses):
+        new_places = []
+        updated_places = []
+        for address, coordinates in coordinates_of_addresses.items():
+            longitude, latitude = coordinates or (None, None)
+            place = stale_places.get(address)
+            if place:
+                place.longitude = longitude
+                place.latitude = latitude
+                place.date_of_request = now
+                updated_places.append(place)
+            else:
+                place = Address(
+                    address=address, longitude=longitude,
+                    latitude=latitude, date_of_request=now)
+                new_places.append(place)
+            places[address] = place
+
+        if updated_places:
+            Address.objects.bulk_update(
+                updated_places, ["longitude", "latitude", "date_of_request"])
+        if new_places:
+            Address.objects.bulk_create(new_places, ignore_conflicts=True)
+        self._remember(updated_places + new_places)
+
+    def _fetch(self, address):
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        try:
+            return address, self.geocoder.fetch_coordinates(address)
+        except (requests.RequestException, *PARSE_ERRORS):
+            logger.exception("Не удалось получить координаты адреса %s", address)
+            return address, FETCH_FAILED
+
+    def bulk_geocode(self, addresses, concurrency=1):
+        """Возвращает словарь {адрес: Address} для всех переданных адресов.
+
+        Адреса, которых нет в кэше, запрашиваются у геокодера в `concurrency`
+        потоков, результаты пишутся в базу одним bulk_create и одним
+        bulk_update. Если геокодер недоступен, адрес в результат не попадает.
+        """
+        now, places, stale_places, addresses_to_fetch = self._lookup(addresses)
+        if not addresses_to_fetch:
+            return places
+
+        workers = min(concurrency, len(addresses_to_fetch))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self._fetch, addresses_to_fetch))
+        else:
+            results = [self._fetch(address) for address in addresses_to_fetch]
+        coordinates_of_addresses = {
+            address: coordinates for address, coordinates in results
+            if coordinates is not FETCH_FAILED
+        }
+        self._store(now, places, stale_places, coordinates_of_addresses)
+        return places
+
+    async def afetch_many(self, addresses, concurrency=10):
+        """Спрашивает у геокодера адреса параллельно, не обращаясь к базе.
+
+        Возвращает словарь {адрес: координаты или None} без адресов, которые
+        не удалось получить.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(address, client):
+            async with semaphore:
+                if self.rate_limiter:
+                    await asyncio.sleep(self.rate_limiter.reserve())
+                try:
+                    return address, await self.geocoder.afetch_coordinates(address, client)
+                except (httpx.HTTPError, *PARSE_ERRORS):
+                    logger.exception("Не удалось получить координаты адреса %s", address)
+                    return address, FETCH_FAILED
+
+        async with httpx.AsyncClient(timeout=settings.GEOCODER_TIMEOUT) as client:
+            results = await asyncio.gather(
+                *(fetch(address, client) for address in addresses))
+        return {
+            address: coordinates for address, coordinates in results
+            if coordinates is not FETCH_FAILED
+        }
+
+    async def abulk_geocode(self, addresses, concurrency=10):
+        """Асинхронный bulk_geocode: адреса геокодируются параллельно."""
+        now, places, stale_places, addresses_to_fetch = await sync_to_async(
+            self._lookup)(addresses)
+        if not addresses_to_fetch:
+            return places
+
+        coordinates_of_addresses = await self.afetch_many(addresses_to_fetch, concurrency)
+        await sync_to_async(self._store)(
+            now, places, stale_places, coordinates_of_addresses)
+        return places
+
+    def bulk_geocode_in_event_loop(self, addresses, concurrency=10):
+        """bulk_geocode для фонового потока: геокодер опрашивается в цикле событий.
+
+        К базе обращается только вызывающий поток, поэтому он же может
+        закрыть свои соединения, когда закончит.
+        """
+        now, places, stale_places, addresses_to_fetch = self._lookup(addresses)
+        if not addresses_to_fetch:
+            return places
+
+        coordinates_of_addresses = asyncio.run(
+            self.afetch_many(addresses_to_fetch, concurrency))
+        self._store(now, places, stale_places, coordinates_of_addresses)
+        return places
+
+
+_geocode_cache = None
+_geocode_cache_lock = threading.Lock()
+
+
+def get_geocoder():
+    geocoder_class = import_string(settings.GEOCODER_BACKEND)
+    return geocoder_class(**settings.GEOCODER_OPTIONS)
+
+
+def get_rate_limiter():
+    if not settings.GEOCODER_RATE_LIMIT:
+        return None
+    return TokenBucket(
+        settings.GEOCODER_RATE_LIMIT, capacity=settings.GEOCODER_CONCURRENCY)
+
+
+def get_geocode_cache():
+    global _geocode_cache
+    with _geocode_cache_lock:
+        if _geocode_cache is None:
+            _geocode_cache = GeocodeCache(
+                get_geocoder(),
+                ttl=timedelta(seconds=settings.GEOCODE_CACHE_TTL),
+                negative_ttl=timedelta(seconds=settings.GEOCODE_NEGATIVE_CACHE_TTL),
+                maxsize=settings.GEOCODE_CACHE_SIZE,
+                rate_limiter=get_rate_limiter(),
+            )
+        return _geocode_cache
+
+
+def bulk_geocode(addresses):
+    return get_geocode_cache().bulk_geocode(
+        addresses, concurrency=settings.GEOCODER_CONCURRENCY)
+
+
+async def abulk_geocode(addresses):
+    return await get_geocode_cache().abulk_geocode(
+        addresses, concurrency=settings.GEOCODER_CONCURRENCY)
@@ -0,0 +1,59 @@
+import random
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from geopy.distance import distance
+
+from address_and_places.distances import rank_restaurants
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает векторный расчёт расстояний с попарным через geopy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--restaurants', type=int, default=200)
+        parser.add_argument('--refine-top', type=int, default=0)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        restaurants = [
+            SimpleNamespace(
+                id=restaurant_id,
+                latitude=generator.uniform(55.5, 55.9),
+                longitude=generator.uniform(37.3, 37.9),
+            )
+            for restaurant_id in range(options['restaurants'])
+        ]
+        points_of_orders = {
+            order_id: (generator.uniform(55.5, 55.9), generator.uniform(37.3, 37.9))
+            for order_id in range(options['orders'])
+        }
+        suitable_restaurants_for_orders = {
+            order_id: restaurants for order_id in points_of_orders}
+
+        started_at = time.perf_counter()
+        for order_id, point in points_of_orders.items():
+            sorted(
+                (
+                    (restaurant, distance(point, (restaurant.latitude, restaurant.longitude)))
+                    for restaurant in suitable_restaurants_for_orders[order_id]
+                ),
+                key=lambda item: item[1],
+            )
+        geopy_seconds = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        rank_restaurants(
+            points_of_orders, suitable_restaurants_for_orders,
+            refine_top=options['refine_top'])
+        numpy_seconds = time.perf_counter() - started_at
+
+        self.stdout.write(
+            f"{options['orders']} заказов × {options['restaurants']} ресторанов\n"
+            f"geopy попарно: {geopy_seconds:.3f} с\n"
+            f"numpy матрицей (уточнение top-{options['refine_top']}): {numpy_seconds:.3f} с\n"
+            f"ускорение: {geopy_seconds / numpy_seconds:.1f}×"
+        )
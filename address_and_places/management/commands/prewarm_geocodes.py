@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from address_and_places.geocoder import bulk_geocode
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Заранее геокодирует адреса необработанных заказов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Сколько адресов геокодировать за один проход')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        addresses = list(
+            Order.objects
+            .unprocessed()
+            .order_by()
+            .values_list("address", flat=True)
+            .distinct()
+        )
+        geocoded_count = 0
+        for start in range(0, len(addresses), batch_size):
+            places = bulk_geocode(addresses[start:start + batch_size])
+            geocoded_count += sum(
+                1 for place in places.values() if place.longitude is not None)
+        self.stdout.write(
+            f"Адресов: {len(addresses)}, с координатами: {geocoded_count}")
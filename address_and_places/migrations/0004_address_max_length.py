@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('address_and_places', '0003_auto_20220130_0158'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='address',
+            name='address',
+            field=models.CharField(max_length=100, unique=True, verbose_name='адрес'),
+        ),
+    ]
@@ -4,7 +4,7 @@ from django.utils import timezone
 
 class Address(models.Model):
     address = models.CharField(
-        verbose_name="адрес", max_length=50, unique=True)
+        verbose_name="адрес", max_length=100, unique=True)
     longitude = models.DecimalField(
         verbose_name="долгота", max_digits=11, decimal_places=8, 
         null=True, blank=True)
@@ -0,0 +1,77 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from .geocoder import get_geocode_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+class GeocodingQueue:
+    """Фоновое геокодирование адресов новых заказов.
+
+    Адреса копятся в множестве, поэтому повторы между заказами схлопываются.
+    Рабочий поток ждёт `batch_delay` секунд, чтобы собрать пачку, и
+    геокодирует её адреса параллельно. С базой работает только сам рабочий
+    поток и после каждой пачки закрывает соединения.
+    """
+
+    def __init__(self, batch_size=100, batch_delay=0.5):
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._has_pending = threading.Event()
+        self._worker = None
+
+    def enqueue(self, address):
+        with self._lock:
+            self._pending.add(address)
+            self._ensure_worker()
+        self._has_pending.set()
+
+    def _ensure_worker(self):
+        if self._worker and self._worker.is_alive():
+            return
+        self._worker = threading.Thread(
+            target=self._run, name="geocoding-queue", daemon=True)
+        self._worker.start()
+
+    def _take_batch(self):
+        with self._lock:
+            batch = [self._pending.pop() for _ in range(min(self.batch_size, len(self._pending)))]
+            if not self._pending:
+                self._has_pending.clear()
+        return batch
+
+    def _run(self):
+        while True:
+            self._has_pending.wait()
+            time.sleep(self.batch_delay)
+            batch = self._take_batch()
+            if batch:
+                self.geocode_batch(batch)
+
+    def geocode_batch(self, batch):
+        try:
+            get_geocode_cache().bulk_geocode_in_event_loop(
+                batch, concurrency=settings.GEOCODER_CONCURRENCY)
+        except Exception:
+            logger.exception("Не удалось геокодировать адреса %s", batch)
+        finally:
+            connections.close_all()
+
+
+geocoding_queue = GeocodingQueue(
+    batch_size=settings.GEOCODE_QUEUE_BATCH_SIZE,
+    batch_delay=settings.GEOCODE_QUEUE_BATCH_DELAY,
+)
+
+
+def enqueue_geocoding(address):
+    if settings.GEOCODE_IN_BACKGROUND:
+        geocoding_queue.enqueue(address)
@@ -1,3 +1,291 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from geopy.distance import distance
+
+from foodcartapp.models import Order, Restaurant
+
+from .distances import rank_restaurants
+from .geocoder import GeocodeCache, TokenBucket, YandexGeocoder
+from .models import Address
+from .tasks import GeocodingQueue
+
+
+NOT_FOUND_ADDRESS = 'Нигде'
+FAILING_ADDRESS = 'Ошибка'
+SLOW_ADDRESS = 'Долго'
+# Ответы, которые не похожи на ответ геокодера.
+MALFORMED_RESPONSES = {
+    'Не JSON': b'<html>Service Unavailable</html>',
+    'Без координат': b'{"response": {}}',
+    'Пустая точка': b'{"response": {"GeoObjectCollection": {"featureMember": [{"GeoObject": {"Point": {"pos": ""}}}]}}}',
+}
+
+
+class FakeGeocoderHandler(BaseHTTPRequestHandler):
+    """Отвечает как геокодер Яндекса и запоминает, что у него спрашивали."""
+
+    def do_GET(self):
+        server = self.server
+        address = parse_qs(urlparse(self.path).query)['geocode'][0]
+        with server.lock:
+            server.requests.append((time.monotonic(), address))
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(server.delay)
+            if address == SLOW_ADDRESS:
+                time.sleep(1)
+            if address == FAILING_ADDRESS:
+                self.send_error(500)
+                return
+            found_places = []
+            if address != NOT_FOUND_ADDRESS:
+                found_places.append({'GeoObject': {'Point': {'pos': '37.61 55.75'}}})
+            body = MALFORMED_RESPONSES.get(address) or json.dumps({
+                'response': {'GeoObjectCollection': {'featureMember': found_places}},
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeGeocoderMixin:
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGeocoderHandler)
+        cls.server.daemon_threads = True
+        cls.server.lock = threading.Lock()
+        # Клиент не дожидается медленного ответа и закрывает соединение.
+        cls.server.handle_error = lambda request, client_address: None
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}/1.x'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requests = []
+        self.server.active = 0
+        self.server.max_active = 0
+        self.server.delay = 0
+
+    def get_cache(self, rate_limiter=None, pool_size=10):
+        geocoder = YandexGeocoder(apikey='test', base_url=self.base_url, pool_size=pool_size)
+        return GeocodeCache(
+            geocoder, ttl=timedelta(days=30), negative_ttl=timedelta(days=1),
+            rate_limiter=rate_limiter)
+
+    def get_requested_addresses(self):
+        return sorted(address for _, address in self.server.requests)
+
+
+class GeocodeCacheTest(FakeGeocoderMixin, TestCase):
+    def test_duplicates_are_fetched_once(self):
+        cache = self.get_cache()
+
+        places = cache.bulk_geocode(['Тверская, 1', 'Тверская, 1', 'Арбат, 2'], concurrency=2)
+
+        self.assertEqual(set(places), {'Тверская, 1', 'Арбат, 2'})
+        self.assertEqual(self.get_requested_addresses(), ['Арбат, 2', 'Тверская, 1'])
+
+        cache.clear()
+        cache.bulk_geocode(['Тверская, 1', 'Арбат, 2'])
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_concurrency_is_bounded(self):
+        self.server.delay = 0.1
+        cache = self.get_cache(pool_size=3)
+
+        places = cache.bulk_geocode([f'Тверская, {number}' for number in range(12)], concurrency=3)
+
+        self.assertEqual(len(places), 12)
+        self.assertEqual(self.server.max_active, 3)
+
+    def test_rate_limit(self):
+        cache = self.get_cache(rate_limiter=TokenBucket(rate=20))
+
+        cache.bulk_geocode([f'Тверская, {number}' for number in range(6)], concurrency=6)
+
+        request_times = sorted(request_time for request_time, _ in self.server.requests)
+        # Шесть запросов при 20 в секунду занимают не меньше 0,25 с.
+        self.assertGreaterEqual(request_times[-1] - request_times[0], 0.2)
+
+    @override_settings(GEOCODER_TIMEOUT=0.2)
+    def test_timeout_is_not_stored(self):
+        cache = self.get_cache()
+
+        with self.assertLogs('address_and_places.geocoder', 'ERROR'):
+            places = cache.bulk_geocode([SLOW_ADDRESS, 'Тверская, 1'], concurrency=2)
+
+        self.assertEqual(set(places), {'Тверская, 1'})
+        self.assertFalse(Address.objects.filter(address=SLOW_ADDRESS).exists())
+
+    def test_failures_are_not_stored(self):
+        cache = self.get_cache()
+
+        with self.assertLogs('address_and_places.geocoder', 'ERROR'):
+            places = cache.bulk_geocode([FAILING_ADDRESS, NOT_FOUND_ADDRESS], concurrency=2)
+
+        self.assertEqual(set(places), {NOT_FOUND_ADDRESS})
+        self.assertIsNone(places[NOT_FOUND_ADDRESS].longitude)
+        self.assertFalse(Address.objects.filter(address=FAILING_ADDRESS).exists())
+
+        # Ненайденный адрес закэширован, а сбой геокодера — нет.
+        cache.clear()
+        with self.assertLogs('address_and_places.geocoder', 'ERROR'):
+            cache.bulk_geocode([FAILING_ADDRESS, NOT_FOUND_ADDRESS])
+        self.assertEqual(
+            self.get_requested_addresses(),
+            sorted([FAILING_ADDRESS, FAILING_ADDRESS, NOT_FOUND_ADDRESS]))
+
+    def test_malformed_responses_are_not_stored(self):
+        cache = self.get_cache()
+
+        with self.assertLogs('address_and_places.geocoder', 'ERROR') as logs:
+            places = cache.bulk_geocode([*MALFORMED_RESPONSES, 'Тверская, 1'], concurrency=2)
+
+        self.assertEqual(set(places), {'Тверская, 1'})
+        self.assertEqual(len(logs.records), len(MALFORMED_RESPONSES))
+        self.assertFalse(Address.objects.filter(address__in=MALFORMED_RESPONSES).exists())
+
+    async def test_async_malformed_responses_are_not_stored(self):
+        cache = self.get_cache()
+
+        with self.assertLogs('address_and_places.geocoder', 'ERROR') as logs:
+            places = await cache.abulk_geocode([*MALFORMED_RESPONSES, 'Тверская, 1'])
+
+        self.assertEqual(set(places), {'Тверская, 1'})
+        self.assertEqual(len(logs.records), len(MALFORMED_RESPONSES))
+
+    def test_results_are_written_at_once(self):
+        stale_at = timezone.now() - timedelta(days=31)
+        Address.objects.bulk_create([
+            Address(address=f'Арбат, {number}', date_of_request=stale_at)
+            for number in range(5)
+        ])
+        cache = self.get_cache()
+        addresses = [f'Арбат, {number}' for number in range(5)]
+        addresses += [f'Тверская, {number}' for number in range(5)]
+
+        # Чтение кэша, один bulk_update и один bulk_create.
+        with self.assertNumQueries(3):
+            places = cache.bulk_geocode(addresses, concurrency=5)
+
+        self.assertEqual(len(places), 10)
+        self.assertEqual(
+            Address.objects.filter(address__in=addresses, longitude__isnull=False).count(), 10)
+
+    async def test_async_duplicates_and_concurrency(self):
+        self.server.delay = 0.1
+        cache = self.get_cache()
+        addresses = [f'Тверская, {number}' for number in range(8)] * 2
+
+        places = await cache.abulk_geocode(addresses, concurrency=4)
+
+        self.assertEqual(len(places), 8)
+        self.assertEqual(len(self.server.requests), 8)
+        self.assertEqual(self.server.max_active, 4)
+
+
+class GeocodingQueueTest(FakeGeocoderMixin, TransactionTestCase):
+    def test_batch_uses_only_worker_connection(self):
+        threads_with_connections = set()
+
+        def remember_thread(**kwargs):
+            threads_with_connections.add(threading.get_ident())
+
+        close_all = connections.close_all
+        threads_closing_connections = []
+
+        def remember_closing_thread():
+            threads_closing_connections.append(threading.get_ident())
+            close_all()
+
+        queue = GeocodingQueue()
+        addresses = [f'Тверская, {number}' for number in range(5)]
+        connection_created.connect(remember_thread)
+        try:
+            with mock.patch('address_and_places.tasks.get_geocode_cache', return_value=self.get_cache()), \
+                    mock.patch.object(connections, 'close_all', side_effect=remember_closing_thread):
+                worker = threading.Thread(target=queue.geocode_batch, args=[addresses])
+                worker.start()
+                worker.join()
+        finally:
+            connection_created.disconnect(remember_thread)
+
+        # Соединение открыл и закрыл сам рабочий поток.
+        self.assertEqual(threads_with_connections, {worker.ident})
+        self.assertEqual(threads_closing_connections, [worker.ident])
+        self.assertEqual(Address.objects.filter(address__in=addresses).count(), 5)
+
+
+class AddressTest(TestCase):
+    def test_address_fits_addresses_of_orders_and_restaurants(self):
+        # Адреса пишутся в базу пачкой, и один слишком длинный адрес на
+        # PostgreSQL уронил бы всю пачку.
+        max_length = Address._meta.get_field('address').max_length
+        for model in [Order, Restaurant]:
+            with self.subTest(model=model.__name__):
+                self.assertGreaterEqual(max_length, model._meta.get_field('address').max_length)
+
+
+class RankRestaurantsTest(SimpleTestCase):
+    def setUp(self):
+        self.restaurants = [
+            SimpleNamespace(id=1, latitude=55.80, longitude=37.60),
+            SimpleNamespace(id=2, latitude=55.76, longitude=37.62),
+            SimpleNamespace(id=3, latitude=55.70, longitude=37.50),
+        ]
+        self.points_of_orders = {10: (55.75, 37.61), 11: (55.81, 37.59), 12: None}
+        self.suitable_restaurants_for_orders = {
+            10: self.restaurants,
+            11: self.restaurants[1:],
+            12: self.restaurants,
+        }
+
+    def test_restaurants_are_sorted_by_distance(self):
+        rankings = rank_restaurants(self.points_of_orders, self.suitable_restaurants_for_orders)
+
+        self.assertEqual([restaurant.id for restaurant, _ in rankings[10]], [2, 1, 3])
+        self.assertEqual([restaurant.id for restaurant, _ in rankings[11]], [2, 3])
+        self.assertEqual(rankings[12], [])
+        for restaurant, restaurant_distance in rankings[10]:
+            self.assertAlmostEqual(
+                restaurant_distance,
+                distance((55.75, 37.61), (restaurant.latitude, restaurant.longitude)).km,
+                delta=restaurant_distance * 0.005,
+            )
+
+    def test_top_restaurants_are_refined_by_geodesic(self):
+        rankings = rank_restaurants(
+            self.points_of_orders, self.suitable_restaurants_for_orders, refine_top=2)
+
+        for order_id in [10, 11]:
+            point = self.points_of_orders[order_id]
+            for restaurant, restaurant_distance in rankings[order_id][:2]:
+                self.assertEqual(
+                    restaurant_distance,
+                    distance(point, (restaurant.latitude, restaurant.longitude)).km)
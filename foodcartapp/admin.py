@@ -1,16 +1,22 @@
+from functools import lru_cache
+
 from django.contrib import admin
 from django.shortcuts import reverse
 from django.templatetags.static import static
 from django.utils.html import format_html
 from django.http import HttpResponse, HttpResponseRedirect
 from django.utils.http import url_has_allowed_host_and_scheme
+from .models import Banner
 from .models import Product
 from .models import ProductCategory
 from .models import Restaurant
 from .models import RestaurantMenuItem
 from .models import Order
 from .models import OrderItem
+from .models import ArchivedOrder
+from .models import ArchivedOrderItem
 from address_and_places.models import Address
+from .changelists import ScalableAdminMixin
 
 
 @admin.register(Address)
@@ -32,6 +38,7 @@ class AddressAdmin(admin.ModelAdmin):
 class RestaurantMenuItemInline(admin.TabularInline):
     model = RestaurantMenuItem
     extra = 0
+    autocomplete_fields = ['restaurant', 'product']
 
 
 @admin.register(Restaurant)
@@ -45,14 +52,26 @@ class RestaurantAdmin(admin.ModelAdmin):
         'name',
         'address',
         'contact_phone',
+        'order_capacity',
     ]
     inlines = [
         RestaurantMenuItemInline
     ]
 
 
+@lru_cache(maxsize=4096)
+def get_product_thumbnail(product_id, image_name):
+    # Имя картинки входит в ключ, поэтому после замены картинки превью
+    # соберётся заново.
+    edit_url = reverse('admin:foodcartapp_product_change', args=(product_id,))
+    return format_html(
+        '<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>',
+        edit_url=edit_url,
+        src=Product._meta.get_field('image').storage.url(image_name))
+
+
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = [
         'get_image_list_preview',
         'name',
@@ -62,6 +81,9 @@ class ProductAdmin(admin.ModelAdmin):
     list_display_links = [
         'name',
     ]
+    list_select_related = [
+        'category',
+    ]
     list_filter = [
         'category',
     ]
@@ -118,11 +140,7 @@ class ProductAdmin(admin.ModelAdmin):
     def get_image_list_preview(self, obj):
         if not obj.image or not obj.id:
             return 'нет картинки'
-        edit_url = reverse('admin:foodcartapp_product_change', args=(obj.id,))
-        return format_html(
-            '<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>',
-            edit_url=edit_url,
-            src=obj.image.url)
+        return get_product_thumbnail(obj.id, obj.image.name)
     get_image_list_preview.short_description = 'превью'
 
 
@@ -131,25 +149,99 @@ class ProductAdmin(admin.ModelAdmin):
     pass
 
 
+@admin.register(Banner)
+class BannerAdmin(admin.ModelAdmin):
+    list_display = [
+        'title',
+        'text',
+        'position',
+        'is_active',
+    ]
+    list_editable = [
+        'position',
+        'is_active',
+    ]
+    list_filter = [
+        'is_active',
+    ]
+
+
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
+    autocomplete_fields = ['product']
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = [
         'firstname',
         'lastname',
         'phonenumber',
         'address',
         'status',
+        'restaurant',
+        'total_price',
         'registrated_at']
+    list_select_related = ['restaurant']
+    list_filter = ['status', 'payment_method']
+    search_fields = [
+        '=id',
+        'phonenumber',
+        'lastname',
+        'address',
+    ]
+    date_hierarchy = 'registrated_at'
+    # Совпадает с индексом по статусу и времени регистрации.
+    ordering = ['-registrated_at', '-id']
     inlines = [OrderItemInline]
     raw_id_fields = ('restaurant',)
+    readonly_fields = ('total_price',)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        Order.objects.filter(pk=form.instance.pk).recalculate_total_price()
 
     def response_change(self, request, obj):
         response = super().response_change(request, obj)
         if "next" in request.GET and url_has_allowed_host_and_scheme(request.GET['next'], "localhost"):
             return HttpResponseRedirect(request.GET['next'])
         return response
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = [
+        'id',
+        'firstname',
+        'lastname',
+        'phonenumber',
+        'address',
+        'total_price',
+        'registrated_at',
+        'archived_at']
+    search_fields = [
+        '=id',
+        'phonenumber',
+        'lastname',
+        'address',
+    ]
+    date_hierarchy = 'registrated_at'
+    ordering = ['-registrated_at', '-id']
+    inlines = [ArchivedOrderItemInline]
+
+    # Архив только для просмотра: заказы в него переносит команда archive_orders.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
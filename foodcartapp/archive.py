@@ -0,0 +1,108 @@
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Sum, Value
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+from .signals import orders_deleted
+
+
+def get_archivable_orders(before):
+    """Обработанные заказы, зарегистрированные раньше `before`."""
+    return Order.objects.filter(status="PR", registrated_at__lt=before)
+
+
+def get_order_id_range():
+    id_range = Order.objects.aggregate(first_id=Min("id"), last_id=Max("id"))
+    return id_range["first_id"], id_range["last_id"]
+
+
+def copy_rows(queryset, model, **values):
+    """Копирует строки `queryset` в таблицу `model` одним INSERT ... SELECT.
+
+    Поля `model` берутся из одноимённых полей `queryset`, остальные
+    заполняются значениями `values`. Строки не загружаются в Python.
+    """
+    fields = [
+        field for field in model._meta.concrete_fields
+        if field.attname not in values
+    ]
+    extra_fields = [model._meta.get_field(name) for name in values]
+    # values() ставит выражения после полей модели, в том же порядке идут
+    # и столбцы INSERT.
+    queryset = queryset.order_by().values(
+        *[field.attname for field in fields],
+        **{
+            field.attname: Value(values[field.name], output_field=field)
+            for field in extra_fields
+        },
+    )
+    select_sql, params = queryset.query.sql_with_params()
+    quote_name = connection.ops.quote_name
+    columns = ", ".join(quote_name(field.column) for field in fields + extra_fields)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote_name(model._meta.db_table)} ({columns}) {select_sql}",
+            params,
+        )
+        return cursor.rowcount
+
+
+def archive_orders(before, first_id, last_id):
+    """Переносит в архив подходящие заказы с id от `first_id` до `last_id`.
+
+    Перенос идёт одной транзакцией: заказ либо уже в архиве, либо ещё в
+    рабочей таблице, поэтому прерванный перенос можно просто запустить
+    заново. Возвращает число перенесённых заказов и позиций.
+    """
+    with transaction.atomic():
+        order_ids = list(
+            get_archivable_orders(before)
+            .filter(id__range=(first_id, last_id))
+            .select_for_update()
+            .values_list("id", flat=True)
+        )
+        if not order_ids:
+            return 0, 0
+        orders_count = copy_rows(
+            Order.objects.filter(id__in=order_ids), ArchivedOrder,
+            archived_at=timezone.now())
+        items_count = copy_rows(
+            OrderItem.objects.filter(order_id__in=order_ids), ArchivedOrderItem)
+        # Удаление без Collector не загружает заказы и не шлёт post_delete
+        # на каждый заказ: об удалении пачки сообщает один сигнал.
+        OrderItem.objects.filter(order_id__in=order_ids)._raw_delete(OrderItem.objects.db)
+        Order.objects.filter(id__in=order_ids)._raw_delete(Order.objects.db)
+        orders_deleted.send(sender=Order, order_ids=order_ids)
+    return orders_count, items_count
+
+
+def get_monthly_sales(since=None):
+    """Число заказов и выручка обработанных заказов по месяцам вместе с архивом.
+
+    Каждая таблица группируется в базе, результаты объединяются UNION ALL и
+    складываются по месяцам: месяц, в котором шёл перенос в архив, есть в
+    обеих частях. Возвращает список (месяц, число заказов, выручка).
+    """
+    monthly_sales = []
+    for model in [Order, ArchivedOrder]:
+        orders = model.objects.filter(status="PR")
+        if since:
+            orders = orders.filter(registrated_at__gte=since)
+        monthly_sales.append(
+            orders
+            .annotate(month=TruncMonth("registrated_at"))
+            .order_by()
+            .values_list("month")
+            .annotate(orders_count=Count("id"), revenue=Sum("total_price"))
+        )
+    hot_sales, archived_sales = monthly_sales
+
+    sales_of_months = {}
+    for month, orders_count, revenue in hot_sales.union(archived_sales, all=True):
+        month_orders_count, month_revenue = sales_of_months.get(month, (0, 0))
+        sales_of_months[month] = (month_orders_count + orders_count, month_revenue + revenue)
+    return [
+        (month, orders_count, revenue)
+        for month, (orders_count, revenue) in sorted(sales_of_months.items())
+    ]
@@ -0,0 +1,192 @@
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from address_and_places.distances import get_point, haversine_matrix
+from address_and_places.geocoder import bulk_geocode
+
+from .matching import get_restaurant_matcher
+from .models import Order
+from .signals import orders_updated
+
+
+def mask_to_array(mask, size):
+    """Переводит битовую маску ресторанов в массив bool длиной `size`."""
+    mask_bytes = np.frombuffer(mask.to_bytes((size + 7) // 8 or 1, 'little'), dtype=np.uint8)
+    return np.unpackbits(mask_bytes, bitorder='little')[:size].astype(bool)
+
+
+def assign(costs, capacities, candidates=8, improvement_passes=5):
+    """Распределяет заказы по ресторанам с наименьшей суммой расстояний.
+
+    `costs` — матрица заказы × рестораны, np.inf там, где ресторан не может
+    приготовить заказ. `capacities` — сколько заказов ещё может взять каждый
+    ресторан, np.inf — без ограничений. Возвращает для каждого заказа
+    номер ресторана или -1, если ни один подходящий ресторан не свободен.
+
+    Сначала пары «заказ — один из `candidates` ближайших ресторанов»
+    разбираются жадно от самой короткой. Заказы, которым не хватило места
+    у ближайших, получают ближайший ресторан со свободным местом. Затем
+    `improvement_passes` раз заказы переезжают в более близкие рестораны,
+    где есть место, или меняются местами с заказом оттуда, если это
+    сокращает суммарный путь.
+    """
+    costs = np.asarray(costs, dtype=float)
+    orders_count, restaurants_count = costs.shape
+    assignment = np.full(orders_count, -1, dtype=np.intp)
+    if not orders_count or not restaurants_count:
+        return assignment
+    capacities = np.array(capacities, dtype=float)
+
+    candidates = min(candidates, restaurants_count)
+    nearest = np.argpartition(costs, candidates - 1, axis=1)[:, :candidates]
+    nearest_costs = np.take_along_axis(costs, nearest, axis=1)
+    order_of_candidates = np.argsort(nearest_costs, axis=1, kind='stable')
+    nearest = np.take_along_axis(nearest, order_of_candidates, axis=1)
+    nearest_costs = np.take_along_axis(nearest_costs, order_of_candidates, axis=1)
+
+    rows, positions = np.nonzero(np.isfinite(nearest_costs))
+    for pair in np.argsort(nearest_costs[rows, positions], kind='stable'):
+        order = rows[pair]
+        restaurant = nearest[order, positions[pair]]
+        if assignment[order] < 0 and capacities[restaurant] > 0:
+            assignment[order] = restaurant
+            capacities[restaurant] -= 1
+
+    for order in np.flatnonzero(assignment < 0):
+        free_costs = np.where(capacities > 0, costs[order], np.inf)
+        restaurant = int(np.argmin(free_costs))
+        if np.isfinite(free_costs[restaurant]):
+            assignment[order] = restaurant
+            capacities[restaurant] -= 1
+
+    orders_of_restaurants = [[] for _ in range(restaurants_count)]
+    for order, restaurant in enumerate(assignment):
+        if restaurant >= 0:
+            orders_of_restaurants[restaurant].append(order)
+
+    for _ in range(improvement_passes):
+        is_improved = False
+        for order in range(orders_count):
+            current = assignment[order]
+            if current < 0:
+                continue
+            for position in range(candidates):
+                restaurant = nearest[order, position]
+                if not costs[order, restaurant] < costs[order, current]:
+                    break
+                if capacities[restaurant] > 0:
+                    capacities[restaurant] -= 1
+                    capacities[current] += 1
+                    orders_of_restaurants[current].remove(order)
+                    orders_of_restaurants[restaurant].append(order)
+                    assignment[order] = restaurant
+                    is_improved = True
+                    break
+
+                others = np.array(orders_of_restaurants[restaurant], dtype=np.intp)
+                if not len(others):
+                    continue
+                gains = (
+                    costs[order, current] + costs[others, restaurant]
+                    - costs[order, restaurant] - costs[others, current]
+                )
+                best = int(np.argmax(gains))
+                if gains[best] > 1e-9:
+                    other = others[best]
+                    orders_of_restaurants[restaurant].remove(other)
+                    orders_of_restaurants[restaurant].append(order)
+                    orders_of_restaurants[current].remove(order)
+                    orders_of_restaurants[current].append(other)
+                    assignment[order], assignment[other] = restaurant, current
+                    is_improved = True
+                    break
+        if not is_improved:
+            break
+    return assignment
+
+
+def assign_unprocessed_orders(reassign=False):
+    """Назначает рестораны необработанным заказам и сохраняет результат.
+
+    Без `reassign` трогает только заказы без ресторана, а уже назначенные
+    заказы занимают место в ресторанах. Возвращает словарь
+    {id заказа: ресторан} для назначенных заказов.
+    """
+    orders = Order.objects.unprocessed()
+    if not reassign:
+        orders = orders.filter(restaurant__isnull=True)
+    products_of_orders = {}
+    addresses_of_orders = {}
+    for order_id, address, product_id in orders.values_list('id', 'address', 'items__product_id'):
+        addresses_of_orders[order_id] = address
+        products_of_order = products_of_orders.setdefault(order_id, set())
+        if product_id is not None:
+            products_of_order.add(product_id)
+
+    places = bulk_geocode(set(addresses_of_orders.values()))
+    points_of_orders = {
+        order_id: get_point(places.get(address))
+        for order_id, address in addresses_of_orders.items()
+    }
+    order_ids = [
+        order_id for order_id, point in points_of_orders.items()
+        if point and products_of_orders[order_id]
+    ]
+    matcher = get_restaurant_matcher()
+    restaurants = matcher.restaurants
+    if not order_ids or not restaurants:
+        return {}
+
+    capacities = np.array([
+        np.inf if restaurant.order_capacity is None else restaurant.order_capacity
+        for restaurant in restaurants
+    ], dtype=float)
+    if not reassign:
+        column_of_restaurant = {restaurant.id: column for column, restaurant in enumerate(restaurants)}
+        busy_restaurants = (
+            Order.objects
+            .unprocessed()
+            .filter(restaurant__isnull=False)
+            .values_list('restaurant')
+            .annotate(orders_count=Count('id'))
+        )
+        for restaurant_id, orders_count in busy_restaurants:
+            if restaurant_id in column_of_restaurant:
+                capacities[column_of_restaurant[restaurant_id]] -= orders_count
+
+    costs = haversine_matrix(
+        [points_of_orders[order_id] for order_id in order_ids],
+        [(float(restaurant.latitude), float(restaurant.longitude)) for restaurant in restaurants],
+    )
+    suitable_of_masks = {}
+    for row, order_id in enumerate(order_ids):
+        mask = matcher.get_mask(products_of_orders[order_id])
+        if mask not in suitable_of_masks:
+            suitable_of_masks[mask] = mask_to_array(mask, len(restaurants))
+        costs[row, ~suitable_of_masks[mask]] = np.inf
+
+    assignment = assign(costs, np.maximum(capacities, 0))
+    assigned_restaurants = {
+        order_id: restaurants[column]
+        for order_id, column in zip(order_ids, assignment)
+        if column >= 0
+    }
+
+    # bulk_update не обновляет auto_now и не посылает post_save, поэтому
+    # updated_at ставится вручную, а доска заказов узнаёт о них из сигнала.
+    updated_at = timezone.now()
+    with transaction.atomic():
+        Order.objects.bulk_update(
+            [
+                Order(id=order_id, restaurant=restaurant, updated_at=updated_at)
+                for order_id, restaurant in assigned_restaurants.items()
+            ],
+            ['restaurant', 'updated_at'],
+            batch_size=500,
+        )
+        order_ids = list(assigned_restaurants)
+        transaction.on_commit(
+            lambda: orders_updated.send(sender=Order, order_ids=order_ids))
+    return assigned_restaurants
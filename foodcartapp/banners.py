@@ -0,0 +1,65 @@
+import threading
+import time
+
+from django.core.cache import cache
+
+from .models import Banner
+from .renderers import dumps
+
+
+BANNERS_VERSION_KEY = 'foodcartapp:banners_version'
+
+_rendered_banners = None
+_rendered_banners_lock = threading.Lock()
+
+
+def bump_banners_version(**kwargs):
+    version = str(time.time_ns())
+    cache.set(BANNERS_VERSION_KEY, version, None)
+    return version
+
+
+def get_banners_version():
+    version = cache.get(BANNERS_VERSION_KEY)
+    if version is None:
+        version = bump_banners_version()
+    return version
+
+
+def render_banners():
+    banners = Banner.objects.filter(is_active=True)
+    return dumps([
+        {
+            'title': banner.title,
+            'src': banner.image.url,
+            'text': banner.text,
+        }
+        for banner in banners
+    ]).encode()
+
+
+def get_cached_banners(version=None):
+    """Возвращает JSON баннеров из памяти процесса или None, если он устарел."""
+    version = version or get_banners_version()
+    rendered_banners = _rendered_banners
+    if rendered_banners is None or rendered_banners[0] != version:
+        return None
+    return rendered_banners[1]
+
+
+def get_rendered_banners():
+    """Возвращает JSON активных баннеров, закэшированный в памяти процесса.
+
+    JSON живёт в памяти процесса, а версия баннеров — в общем кэше, поэтому
+    изменение баннера в одном процессе сбрасывает JSON во всех.
+    """
+    global _rendered_banners
+    version = get_banners_version()
+    rendered_banners = get_cached_banners(version)
+    if rendered_banners is None:
+        with _rendered_banners_lock:
+            rendered_banners = get_cached_banners(version)
+            if rendered_banners is None:
+                rendered_banners = render_banners()
+                _rendered_banners = (version, rendered_banners)
+    return rendered_banners
@@ -0,0 +1,179 @@
+import base64
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+
+from .models import Product
+from .renderers import compress, dumps, iter_json_array
+
+
+CATALOGUE_VERSION_KEY = 'foodcartapp:catalogue_version'
+CATALOGUE_KEY = 'foodcartapp:catalogue:{version}:{encoding}'
+CATALOGUE_PAGE_KEY = 'foodcartapp:catalogue:{version}:page:{params}'
+CATALOGUE_TIMEOUT = 24 * 60 * 60
+
+
+def bump_catalogue_version(**kwargs):
+    version = {
+        'version': str(time.time_ns()),
+        'modified_at': datetime.now(timezone.utc).replace(microsecond=0),
+    }
+    cache.set(CATALOGUE_VERSION_KEY, version, None)
+    return version
+
+
+def get_catalogue_version():
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        version = bump_catalogue_version()
+    return version
+
+
+def get_catalogue_etag(version, encoding=None):
+    """Тела каталога без сжатия, в gzip и в br различаются побайтно,
+    поэтому у каждого свой сильный ETag."""
+    if encoding:
+        return f'{version}-{encoding}'
+    return version
+
+
+def get_catalogue_last_modified(request):
+    return get_catalogue_version()['modified_at']
+
+
+PRODUCT_FIELDS = {
+    'id': lambda product: product.id,
+    'name': lambda product: product.name,
+    'price': lambda product: product.price,
+    'special_status': lambda product: product.special_status,
+    'description': lambda product: product.description,
+    'category': lambda product: {
+        'id': product.category.id,
+        'name': product.category.name,
+    },
+    'image': lambda product: product.image.url,
+    'restaurant': lambda product: {
+        'id': product.id,
+        'name': product.name,
+    },
+}
+
+
+def serialize_product(product, fields=None):
+    return {
+        field: PRODUCT_FIELDS[field](product)
+        for field in fields or PRODUCT_FIELDS
+    }
+
+
+def encode_cursor(product_id):
+    return base64.urlsafe_b64encode(str(product_id).encode()).decode()
+
+
+def render_catalogue_page(cursor, limit, category=None, special_status=None, fields=None):
+    """Возвращает страницу каталога и id последнего товара на ней.
+
+    Страницы отсчитываются от id товара, поэтому каждая стоит один запрос
+    к базе, как бы далеко от начала каталога она ни была.
+    """
+    products = Product.objects.select_related('category').available().order_by('id')
+    if cursor is not None:
+        products = products.filter(id__gt=cursor)
+    if category is not None:
+        products = products.filter(category_id=category)
+    if special_status is not None:
+        products = products.filter(special_status=special_status)
+    products = list(products[:limit + 1])
+    next_cursor = products[limit - 1].id if len(products) > limit else None
+    return [serialize_product(product, fields) for product in products[:limit]], next_cursor
+
+
+def format_query_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, list):
+        return ','.join(value)
+    return value
+
+
+def get_catalogue_page_key(version, params):
+    return CATALOGUE_PAGE_KEY.format(
+        version=version, params=urlencode(sorted(params.items())))
+
+
+def get_catalogue_page(version, path, params):
+    key = get_catalogue_page_key(version, params)
+    rendered_page = cache.get(key)
+    if rendered_page is None:
+        dumped_products, next_cursor = render_catalogue_page(
+            params['cursor'], params['limit'],
+            category=params['category'],
+            special_status=params['special_status'],
+            fields=params['fields'],
+        )
+        next_url = None
+        if next_cursor is not None:
+            next_params = {
+                name: format_query_value(value)
+                for name, value in params.items() if value is not None
+            }
+            next_params['cursor'] = encode_cursor(next_cursor)
+            next_url = f'{path}?{urlencode(next_params)}'
+        rendered_page = dumps({
+            'results': dumped_products,
+            'next': next_url,
+        }).encode()
+        cache.set(key, rendered_page, CATALOGUE_TIMEOUT)
+    return rendered_page
+
+
+def iter_catalogue():
+    products = Product.objects.select_related('category').available()
+    return iter_json_array(products.iterator(), serialize_product)
+
+
+def render_catalogue(version):
+    """Собирает каталог целиком и кладёт его в кэш."""
+    rendered_catalogue = b''.join(iter_catalogue())
+    cache.set(
+        CATALOGUE_KEY.format(version=version, encoding='identity'),
+        rendered_catalogue,
+        CATALOGUE_TIMEOUT,
+    )
+    return rendered_catalogue
+
+
+def stream_catalogue(version):
+    """Отдаёт каталог кусками и по окончании кладёт его в кэш."""
+    chunks = []
+    for chunk in iter_catalogue():
+        chunks.append(chunk)
+        yield chunk
+    cache.set(
+        CATALOGUE_KEY.format(version=version, encoding='identity'),
+        b''.join(chunks),
+        CATALOGUE_TIMEOUT,
+    )
+
+
+def get_rendered_catalogue(version, encoding=None):
+    """Возвращает JSON каталога в байтах, сжатый `encoding`, или None.
+
+    Кэш привязан к версии каталога, которую сигналы сдвигают при каждом
+    изменении товаров, категорий и меню ресторанов. Сжатый вариант
+    считается один раз на версию.
+    """
+    encoding = encoding or 'identity'
+    key = CATALOGUE_KEY.format(version=version, encoding=encoding)
+    rendered_catalogue = cache.get(key)
+    if rendered_catalogue is not None or encoding == 'identity':
+        return rendered_catalogue
+
+    rendered_catalogue = get_rendered_catalogue(version)
+    if rendered_catalogue is None:
+        return None
+    rendered_catalogue = compress(rendered_catalogue, encoding)
+    cache.set(key, rendered_catalogue, CATALOGUE_TIMEOUT)
+    return rendered_catalogue
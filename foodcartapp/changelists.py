@@ -0,0 +1,179 @@
+import base64
+import json
+
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Max, Min, Q
+from django.utils.functional import cached_property
+
+
+# Больше стольких строк отфильтрованный список не считает.
+COUNT_LIMIT = 10000
+CURSOR_VAR = 'after'
+
+
+def estimate_rows_count(model):
+    """Примерное число строк в таблице без COUNT(*) или None, если оценить нельзя."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [model._meta.db_table])
+            row = cursor.fetchone()
+        # До первого ANALYZE reltuples равен -1 или 0.
+        return row[0] if row and row[0] > 0 else None
+    if model._meta.pk.get_internal_type() in ('AutoField', 'BigAutoField', 'IntegerField'):
+        # Крайние id находятся по первичному ключу. Отдельными запросами,
+        # потому что SQLite ищет по индексу, только если MIN или MAX один.
+        first_id = model._default_manager.aggregate(first_id=Min('pk'))['first_id']
+        if first_id is None:
+            return 0
+        last_id = model._default_manager.aggregate(last_id=Max('pk'))['last_id']
+        return last_id - first_id + 1
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор для больших таблиц, который не считает все строки.
+
+    Список считается только до COUNT_LIMIT строк, так что небольшие и
+    отфильтрованные списки получают точное число. Если строк больше,
+    для списка без фильтров число оценивается по статистике базы или по
+    диапазону id — с дырами в id такая оценка больше настоящего числа.
+    Оценку отмечает `is_estimated_count`, обрезанный подсчёт —
+    `is_capped_count`.
+    """
+    is_estimated_count = False
+    is_capped_count = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        count = queryset.order_by()[:COUNT_LIMIT + 1].count()
+        if count <= COUNT_LIMIT:
+            return count
+        if not queryset.query.where:
+            estimated_count = estimate_rows_count(queryset.model)
+            if estimated_count is not None and estimated_count > COUNT_LIMIT:
+                self.is_estimated_count = True
+                return estimated_count
+        self.is_capped_count = True
+        return COUNT_LIMIT
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+class KeysetChangeList(ChangeList):
+    """Список админки, который листается по значениям последней строки, а не через OFFSET.
+
+    Работает, пока список отсортирован как `ordering` в админке, а порядок
+    заканчивается первичным ключом и не содержит полей с NULL. Ссылка
+    «Дальше» передаёт значения полей сортировки последней строки, и каждая
+    страница стоит один запрос по индексу, как бы далеко она ни была.
+    Если менеджер сортирует список по другому столбцу, работает обычная
+    постраничная навигация.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.request = request
+        self.cursor = None
+        self.next_page_url = None
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    @cached_property
+    def keyset_ordering(self):
+        ordering = list(self.model_admin.get_ordering(self.request) or [])
+        if ORDER_VAR in self.params or not ordering:
+            return None
+        keyset_ordering = []
+        for field_name in ordering:
+            is_descending = field_name.startswith('-')
+            field_name = field_name.lstrip('-')
+            if field_name == 'pk':
+                field_name = self.opts.pk.name
+            keyset_ordering.append((field_name, is_descending))
+        if keyset_ordering[-1][0] != self.opts.pk.name:
+            return None
+        return keyset_ordering
+
+    @property
+    def is_keyset(self):
+        return self.keyset_ordering is not None
+
+    def get_cursor_filter(self, values):
+        if len(values) != len(self.keyset_ordering):
+            return None
+        try:
+            values = [
+                self.opts.get_field(field_name).to_python(value)
+                for (field_name, _), value in zip(self.keyset_ordering, values)
+            ]
+        except ValidationError:
+            return None
+        cursor_filter = Q()
+        equal_fields = {}
+        for (field_name, is_descending), value in zip(self.keyset_ordering, values):
+            lookup = 'lt' if is_descending else 'gt'
+            cursor_filter |= Q(**equal_fields, **{f'{field_name}__{lookup}': value})
+            equal_fields[field_name] = value
+        return cursor_filter
+
+    def get_results(self, request):
+        queryset = self.queryset
+        if self.is_keyset and CURSOR_VAR in self.params:
+            values = decode_cursor(self.params[CURSOR_VAR])
+            cursor_filter = self.get_cursor_filter(values) if values else None
+            if cursor_filter is not None:
+                self.cursor = values
+                self.queryset = self.queryset.filter(cursor_filter)
+                self.page_num = 1
+        super().get_results(request)
+        if self.cursor is not None:
+            # Число строк и навигация — для всего списка, а не для его
+            # хвоста после курсора.
+            self.paginator = self.model_admin.get_paginator(request, queryset, self.list_per_page)
+            self.result_count = self.paginator.count
+            self.can_show_all = self.result_count <= self.list_max_show_all
+            self.multi_page = True
+        if not self.is_keyset or not self.multi_page or self.show_all:
+            return
+
+        self.result_list = list(self.result_list)
+        if len(self.result_list) == self.list_per_page:
+            last_row = self.result_list[-1]
+            next_cursor = encode_cursor([
+                self.opts.get_field(field_name).value_to_string(last_row)
+                for field_name, _ in self.keyset_ordering
+            ])
+            self.next_page_url = self.get_query_string({CURSOR_VAR: next_cursor}, [PAGE_VAR])
+
+    @property
+    def first_page_url(self):
+        return self.get_query_string(remove=[CURSOR_VAR, PAGE_VAR])
+
+
+class ScalableAdminMixin:
+    """Админка для таблиц на миллионы строк: без COUNT(*) и без OFFSET."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/foodcartapp/keyset_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
@@ -0,0 +1,50 @@
+import base64
+import binascii
+
+from django import forms
+
+from .catalogue import PRODUCT_FIELDS
+
+
+class ProductListForm(forms.Form):
+    cursor = forms.CharField(required=False)
+    limit = forms.IntegerField(required=False, min_value=1, max_value=200)
+    category = forms.IntegerField(required=False)
+    special_status = forms.TypedChoiceField(
+        required=False,
+        choices=[('true', 'true'), ('false', 'false')],
+        coerce=lambda value: value == 'true',
+        empty_value=None,
+    )
+    fields = forms.CharField(required=False)
+
+    @classmethod
+    def has_params(cls, query):
+        """Есть ли в запросе параметры постраничного каталога.
+
+        Чужие параметры вроде меток UTM или `_` против кэша браузера не в счёт.
+        """
+        return any(name in query for name in cls.base_fields)
+
+    def clean_cursor(self):
+        cursor = self.cleaned_data['cursor']
+        if not cursor:
+            return None
+        try:
+            return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise forms.ValidationError('Некорректный курсор')
+
+    def clean_limit(self):
+        return self.cleaned_data['limit'] or 50
+
+    def clean_fields(self):
+        fields = self.cleaned_data['fields']
+        if not fields:
+            return None
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown_fields = set(fields) - PRODUCT_FIELDS.keys()
+        if unknown_fields:
+            raise forms.ValidationError(
+                f'Неизвестные поля: {", ".join(sorted(unknown_fields))}')
+        return fields
@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from address_and_places.distances import get_point
+from address_and_places.geocoder import bulk_geocode
+
+from .catalogue import bump_catalogue_version
+from .matching import bump_menu_version
+from .models import Product, ProductCategory, Restaurant, RestaurantMenuItem
+
+
+PRODUCT_FIELDS = ['category_id', 'price', 'description', 'image']
+RESTAURANT_FIELDS = ['address', 'contact_phone', 'latitude', 'longitude']
+
+
+def iter_json_array_file(file, chunk_size=64 * 1024):
+    """Читает JSON-массив из файла по одному элементу, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    while not buffer:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        buffer = chunk.lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Ожидался JSON-массив')
+    position = 1
+    is_eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if is_eof:
+                raise
+        else:
+            # Элемент прочитан целиком, только если за ним уже видна запятая
+            # или конец массива: число на границе куска могло оборваться.
+            next_position = end
+            while next_position < len(buffer) and buffer[next_position] in ' \t\r\n':
+                next_position += 1
+            if next_position < len(buffer) and buffer[next_position] in ',]':
+                yield item
+                position = next_position
+                continue
+            if is_eof:
+                raise ValueError('Некорректный JSON-массив')
+
+        chunk = file.read(chunk_size)
+        is_eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class CatalogueImporter:
+    """Загружает товары и рестораны из JSON пачками.
+
+    Товары, категории и рестораны сопоставляются с уже существующими по
+    названию, поэтому повторная загрузка того же файла ничего не дублирует.
+    Картинки копируются в хранилище под именем из хэша содержимого, так что
+    одна и та же картинка сохраняется один раз.
+    """
+
+    def __init__(self, images_dir=None, batch_size=1000):
+        self.images_dir = images_dir
+        self.batch_size = batch_size
+        self.categories = {}
+        self.stored_images = {}
+        self.restaurant_names = set()
+        self.stats = Counter()
+
+    def store_image(self, image_name):
+        if not self.images_dir:
+            return image_name
+        image_path = os.path.join(self.images_dir, image_name)
+        if image_path in self.stored_images:
+            return self.stored_images[image_path]
+        if not os.path.exists(image_path):
+            self.stats['images_missing'] += 1
+            self.stored_images[image_path] = image_name
+            return image_name
+
+        digest = hashlib.sha256()
+        with open(image_path, 'rb') as image:
+            for chunk in iter(lambda: image.read(64 * 1024), b''):
+                digest.update(chunk)
+        stored_name = f'products/{digest.hexdigest()[:32]}{os.path.splitext(image_name)[1]}'
+        if not default_storage.exists(stored_name):
+            with open(image_path, 'rb') as image:
+                stored_name = default_storage.save(stored_name, File(image))
+            self.stats['images_copied'] += 1
+        self.stored_images[image_path] = stored_name
+        return stored_name
+
+    def get_categories(self, names):
+        missing_names = set(names) - self.categories.keys()
+        if missing_names:
+            for category in ProductCategory.objects.filter(name__in=missing_names):
+                self.categories.setdefault(category.name, category)
+            new_categories = [
+                ProductCategory(name=name)
+                for name in missing_names - self.categories.keys()
+            ]
+            ProductCategory.objects.bulk_create(new_categories)
+            self.stats['categories_created'] += len(new_categories)
+            for category in ProductCategory.objects.filter(
+                    name__in=[category.name for category in new_categories]):
+                self.categories.setdefault(category.name, category)
+        return self.categories
+
+    def load_products(self, file):
+        for entries in iter_batches(iter_json_array_file(file), self.batch_size):
+            with transaction.atomic():
+                self.upsert_products(entries)
+
+    def upsert_products(self, entries):
+        entries = {entry['title']: entry for entry in entries}
+        self.stats['products_read'] += len(entries)
+        categories = self.get_categories(
+            {entry['type'] for entry in entries.values() if entry.get('type')})
+        existing_products = {}
+        for product in Product.objects.filter(name__in=entries).order_by('id'):
+            existing_products.setdefault(product.name, product)
+
+        new_products = []
+        # bulk_update строит CASE на каждое поле, поэтому товары
+        # группируются по набору изменившихся полей.
+        updated_products = defaultdict(list)
+        for name, entry in entries.items():
+            category = categories.get(entry.get('type'))
+            fields = {
+                'category_id': category.id if category else None,
+                'price': Decimal(str(entry['price'])),
+                'description': entry.get('description', ''),
+                'image': self.store_image(entry['img']) if entry.get('img') else '',
+            }
+            product = existing_products.get(name)
+            if product is None:
+                new_products.append(Product(name=name, **fields))
+                continue
+            current_fields = {
+                'category_id': product.category_id,
+                'price': product.price,
+                'description': product.description,
+                'image': product.image.name,
+            }
+            changed_fields = tuple(
+                field for field in PRODUCT_FIELDS if current_fields[field] != fields[field])
+            if changed_fields:
+                for field in changed_fields:
+                    setattr(product, field, fields[field])
+                updated_products[changed_fields].append(product)
+
+        Product.objects.bulk_create(new_products, batch_size=self.batch_size)
+        for changed_fields, products in updated_products.items():
+            Product.objects.bulk_update(products, changed_fields, batch_size=self.batch_size)
+            self.stats['products_updated'] += len(products)
+        self.stats['products_created'] += len(new_products)
+
+    def load_restaurants(self, file):
+        for entries in iter_batches(iter_json_array_file(file), self.batch_size):
+            with transaction.atomic():
+                self.upsert_restaurants(entries)
+
+    def upsert_restaurants(self, entries):
+        entries = {entry['title']: entry for entry in entries}
+        self.stats['restaurants_read'] += len(entries)
+        places = bulk_geocode({
+            entry['address'] for entry in entries.values()
+            if entry.get('address') and entry.get('latitude') is None
+        })
+        existing_restaurants = {}
+        for restaurant in Restaurant.objects.filter(name__in=entries).order_by('id'):
+            existing_restaurants.setdefault(restaurant.name, restaurant)
+
+        new_restaurants = []
+        updated_restaurants = []
+        for name, entry in entries.items():
+            restaurant = existing_restaurants.get(name)
+            place = places.get(entry.get('address'))
+            if entry.get('latitude') is not None:
+                point = (entry['latitude'], entry['longitude'])
+            elif get_point(place):
+                point = (place.latitude, place.longitude)
+            elif restaurant:
+                point = (restaurant.latitude, restaurant.longitude)
+            else:
+                # Ресторан без координат не на чем показать менеджеру.
+                self.stats['restaurants_skipped'] += 1
+                continue
+            point = tuple(Decimal(str(coordinate)) for coordinate in point)
+            self.restaurant_names.add(name)
+            fields = {
+                'address': entry.get('address', ''),
+                'contact_phone': entry.get('contact_phone', ''),
+                'latitude': point[0],
+                'longitude': point[1],
+            }
+            if restaurant is None:
+                new_restaurants.append(Restaurant(name=name, **fields))
+                continue
+            if any(getattr(restaurant, field) != value for field, value in fields.items()):
+                for field, value in fields.items():
+                    setattr(restaurant, field, value)
+                updated_restaurants.append(restaurant)
+
+        Restaurant.objects.bulk_create(new_restaurants, batch_size=self.batch_size)
+        Restaurant.objects.bulk_update(
+            updated_restaurants, RESTAURANT_FIELDS, batch_size=self.batch_size)
+        self.stats['restaurants_created'] += len(new_restaurants)
+        self.stats['restaurants_updated'] += len(updated_restaurants)
+
+        menus = {name: entry['menu'] for name, entry in entries.items() if entry.get('menu')}
+        if menus:
+            self.add_menu_items(menus)
+
+    def add_menu_items(self, menus):
+        """Добавляет в меню ресторанов товары: menus — {ресторан: [товары]}."""
+        restaurant_ids = dict(
+            Restaurant.objects.filter(name__in=menus).values_list('name', 'id'))
+        product_ids = dict(
+            Product.objects
+            .filter(name__in={name for menu in menus.values() for name in menu})
+            .values_list('name', 'id')
+        )
+        menu_items = [
+            RestaurantMenuItem(
+                restaurant_id=restaurant_ids[restaurant_name],
+                product_id=product_ids[product_name],
+            )
+            for restaurant_name, menu in menus.items()
+            if restaurant_name in restaurant_ids
+            for product_name in menu
+            if product_name in product_ids
+        ]
+        RestaurantMenuItem.objects.bulk_create(
+            menu_items, batch_size=self.batch_size, ignore_conflicts=True)
+
+    def fill_menus(self):
+        """Добавляет в меню загруженных ресторанов все товары каталога."""
+        restaurant_ids = list(
+            Restaurant.objects.filter(name__in=self.restaurant_names).values_list('id', flat=True))
+        product_ids = Product.objects.order_by('id').values_list('id', flat=True)
+        for product_ids_batch in iter_batches(
+                product_ids.iterator(chunk_size=self.batch_size), self.batch_size):
+            menu_items = [
+                RestaurantMenuItem(restaurant_id=restaurant_id, product_id=product_id)
+                for restaurant_id in restaurant_ids
+                for product_id in product_ids_batch
+            ]
+            RestaurantMenuItem.objects.bulk_create(
+                menu_items, batch_size=self.batch_size, ignore_conflicts=True)
+
+    def finish(self):
+        # bulk_create и bulk_update не посылают сигналов, поэтому кэши
+        # каталога и индекс ресторанов сбрасываются вручную.
+        bump_catalogue_version()
+        bump_menu_version()
@@ -0,0 +1,77 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from foodcartapp.archive import archive_orders, get_archivable_orders, get_order_id_range
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит обработанные заказы старше заданного числа дней в архив '
+        'пачками по диапазонам id'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help='Переносить заказы, зарегистрированные раньше стольких дней назад')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько id заказов просматривать за одну транзакцию')
+        parser.add_argument(
+            '--start-id', type=int,
+            help='С какого id продолжить прерванный перенос')
+        parser.add_argument(
+            '--max-batches', type=int,
+            help='Остановиться после стольких транзакций')
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Пауза между транзакциями в секундах, чтобы не нагружать базу')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать заказы, которые будут перенесены')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        if options['dry_run']:
+            orders_count = get_archivable_orders(before).count()
+            self.stdout.write(
+                f'Будет перенесено заказов: {orders_count} '
+                f'(зарегистрированы раньше {before:%Y-%m-%d})')
+            return
+
+        first_id, last_id = get_order_id_range()
+        if first_id is None:
+            self.stdout.write('Заказов нет')
+            return
+        if options['start_id'] is not None:
+            first_id = max(first_id, options['start_id'])
+
+        batch_size = max(1, options['batch_size'])
+        started_at = time.monotonic()
+        archived_orders_count = archived_items_count = batches_count = 0
+        batch_first_id = first_id
+        while batch_first_id <= last_id:
+            if options['max_batches'] is not None and batches_count >= options['max_batches']:
+                break
+            batch_last_id = batch_first_id + batch_size - 1
+            orders_count, items_count = archive_orders(before, batch_first_id, batch_last_id)
+            archived_orders_count += orders_count
+            archived_items_count += items_count
+            batches_count += 1
+            batch_first_id = batch_last_id + 1
+            if orders_count:
+                self.stdout.write(
+                    f'id до {batch_last_id}: перенесено заказов {archived_orders_count}')
+                if options['pause']:
+                    time.sleep(options['pause'])
+
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(
+            f'Перенесено заказов: {archived_orders_count}, позиций: {archived_items_count} '
+            f'за {elapsed:.1f} с')
+        if batch_first_id <= last_id:
+            self.stdout.write(f'Продолжить можно с --start-id {batch_first_id}')
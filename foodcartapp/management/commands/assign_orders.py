@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.assignment import assign_unprocessed_orders
+
+
+class Command(BaseCommand):
+    help = 'Назначает необработанным заказам ближайшие подходящие рестораны с учётом их загрузки'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reassign', action='store_true',
+            help='Заново распределить и заказы, которым ресторан уже назначен')
+
+    def handle(self, *args, **options):
+        assigned_restaurants = assign_unprocessed_orders(reassign=options['reassign'])
+        self.stdout.write(f"Назначено ресторанов заказам: {len(assigned_restaurants)}")
@@ -0,0 +1,64 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from address_and_places.distances import haversine_matrix
+from foodcartapp.assignment import assign
+
+
+class Command(BaseCommand):
+    help = 'Замеряет распределение заказов по ресторанам на синтетических данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=10000)
+        parser.add_argument('--restaurants', type=int, default=500)
+        parser.add_argument('--capacity', type=int, default=25,
+                            help='Сколько заказов может взять каждый ресторан')
+        parser.add_argument('--menu-coverage', type=float, default=0.7,
+                            help='Доля ресторанов, способных приготовить заказ')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        numpy_generator = np.random.default_rng(options['seed'])
+
+        def get_points(count):
+            return [
+                (generator.uniform(55.5, 55.9), generator.uniform(37.3, 37.9))
+                for _ in range(count)
+            ]
+
+        costs = haversine_matrix(get_points(options['orders']), get_points(options['restaurants']))
+        costs[numpy_generator.random(costs.shape) > options['menu_coverage']] = np.inf
+        capacities = np.full(options['restaurants'], options['capacity'])
+
+        started_at = time.perf_counter()
+        greedy_assignment = assign(costs, capacities, improvement_passes=0)
+        greedy_seconds = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        assignment = assign(costs, capacities)
+        seconds = time.perf_counter() - started_at
+
+        def get_total_km(assignment):
+            rows = np.flatnonzero(assignment >= 0)
+            return costs[rows, assignment[rows]].sum(), len(rows)
+
+        # Сумма расстояний до ближайшего подходящего ресторана без учёта
+        # загрузки — нижняя граница для любого распределения.
+        lower_bound_km = np.min(costs, axis=1)
+        lower_bound_km = lower_bound_km[np.isfinite(lower_bound_km)].sum()
+        greedy_km, greedy_count = get_total_km(greedy_assignment)
+        total_km, assigned_count = get_total_km(assignment)
+        loads = np.bincount(assignment[assignment >= 0], minlength=options['restaurants'])
+
+        self.stdout.write(
+            f"{options['orders']} заказов × {options['restaurants']} ресторанов, "
+            f"не больше {options['capacity']} заказов на ресторан\n"
+            f"жадно: {greedy_seconds:.2f} с, назначено {greedy_count}, {greedy_km:.0f} км\n"
+            f"с улучшением: {seconds:.2f} с, назначено {assigned_count}, {total_km:.0f} км\n"
+            f"нижняя граница без учёта загрузки: {lower_bound_km:.0f} км\n"
+            f"максимальная загрузка ресторана: {loads.max()}"
+        )
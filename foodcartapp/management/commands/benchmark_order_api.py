@@ -0,0 +1,74 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+
+from foodcartapp.models import Product, ProductCategory
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает пропускную способность /api/order/ и /api/orders/bulk/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--items', type=int, default=3,
+                            help='Позиций в каждом заказе')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run_benchmark(options)
+            transaction.set_rollback(True)
+
+    def get_product_ids(self, items_count):
+        product_ids = list(Product.objects.values_list('id', flat=True)[:100])
+        if len(product_ids) >= items_count:
+            return product_ids
+        category = ProductCategory.objects.create(name='benchmark')
+        Product.objects.bulk_create([
+            Product(name=f'benchmark {number}', category=category, price=100, image='benchmark.jpg')
+            for number in range(items_count)
+        ])
+        return list(Product.objects.filter(category=category).values_list('id', flat=True))
+
+    def run_benchmark(self, options):
+        generator = random.Random(options['seed'])
+        product_ids = self.get_product_ids(options['items'])
+        orders = [
+            {
+                'firstname': 'Иван',
+                'lastname': 'Петров',
+                'phonenumber': '+79261234567',
+                'address': f'Москва, ул. Тверская, {generator.randint(1, 200)}',
+                'products': [
+                    {'product': product_id, 'quantity': generator.randint(1, 3)}
+                    for product_id in generator.sample(product_ids, options['items'])
+                ],
+            }
+            for _ in range(options['orders'])
+        ]
+        client = Client()
+        batch_size = options['batch_size']
+
+        with override_settings(ALLOWED_HOSTS=['*'], GEOCODE_IN_BACKGROUND=False):
+            started_at = time.perf_counter()
+            for order in orders:
+                client.post('/api/order/', json.dumps(order), content_type='application/json')
+            single_seconds = time.perf_counter() - started_at
+
+            started_at = time.perf_counter()
+            for start in range(0, len(orders), batch_size):
+                client.post(
+                    '/api/orders/bulk/', json.dumps(orders[start:start + batch_size]),
+                    content_type='application/json')
+            bulk_seconds = time.perf_counter() - started_at
+
+        self.stdout.write(
+            f"{len(orders)} заказов по {options['items']} позиции\n"
+            f"/api/order/: {len(orders) / single_seconds:.0f} заказов/с\n"
+            f"/api/orders/bulk/ пачками по {batch_size}: {len(orders) / bulk_seconds:.0f} заказов/с"
+        )
@@ -0,0 +1,157 @@
+import json
+import platform
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from address_and_places.geocoder import get_geocode_cache
+from foodcartapp.catalogue import bump_catalogue_version
+from foodcartapp.matching import bump_menu_version
+from foodcartapp.synthetic import create_addresses, create_catalogue, create_orders
+
+
+SCALES = {
+    'small': {'restaurants': 10, 'products': 100, 'addresses': 100, 'orders': 100},
+    'medium': {'restaurants': 50, 'products': 1000, 'addresses': 1000, 'orders': 1000},
+    'large': {'restaurants': 100, 'products': 2000, 'addresses': 5000, 'orders': 10000},
+    # Большое меню для страницы товаров менеджера.
+    'menu': {'restaurants': 300, 'products': 5000, 'addresses': 100, 'orders': 100},
+}
+ENDPOINTS = [
+    ('GET', '/manager/orders/'),
+    ('GET', '/manager/products/'),
+    ('GET', '/manager/restaurants/'),
+    ('GET', '/api/products/'),
+    ('GET', '/api/products/?limit=50'),
+    ('GET', '/api/banners/'),
+    ('POST', '/api/order/'),
+]
+
+
+def get_percentile(sorted_values, percent):
+    index = max(0, round(percent / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа, число запросов к базе и пик памяти страниц '
+        'и API на синтетических данных разного объёма и пишет итог в JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', nargs='+', choices=list(SCALES), default=['small', 'medium'])
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Сколько раз запрашивать каждый адрес')
+        parser.add_argument('--output', help='Файл для результатов')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if settings.DEBUG:
+            self.stderr.write(
+                'DEBUG включён: панель отладки исказит замеры, запустите с DEBUG=False')
+        started_at = datetime.now()
+        results = {
+            'started_at': started_at.isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'scales': {},
+        }
+        for scale in options['scales']:
+            generator = random.Random(options['seed'])
+            with transaction.atomic():
+                results['scales'][scale] = {
+                    'sizes': SCALES[scale],
+                    'endpoints': self.run_scale(
+                        SCALES[scale], max(1, options['repeat']), generator),
+                }
+                transaction.set_rollback(True)
+            bump_menu_version()
+            get_geocode_cache().clear()
+            bump_catalogue_version()
+
+        output = options['output'] or f'benchmark-{started_at:%Y%m%d-%H%M%S}.json'
+        with open(output, 'w') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+        self.stdout.write(f'Результаты записаны в {output}')
+
+    def run_scale(self, sizes, repeat, generator):
+        products, _ = create_catalogue(
+            sizes['restaurants'], sizes['products'], generator=generator)
+        addresses = create_addresses(sizes['addresses'], generator=generator)
+        create_orders(sizes['orders'], products, addresses, generator=generator)
+
+        manager = get_user_model().objects.create(username='benchmark', is_staff=True)
+        client = Client()
+        client.force_login(manager)
+        order = json.dumps({
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79261234567',
+            'address': addresses[0],
+            'products': [
+                {'product': product.id, 'quantity': 1}
+                for product in generator.sample(products, min(3, len(products)))
+            ],
+        })
+
+        def make_request(method, url):
+            if method == 'POST':
+                response = client.post(url, order, content_type='application/json')
+            else:
+                response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return response
+
+        endpoints = {}
+        with override_settings(ALLOWED_HOSTS=['*'], GEOCODE_IN_BACKGROUND=False):
+            for method, url in ENDPOINTS:
+                # Первый запрос прогревает кэши процесса.
+                status_code = make_request(method, url).status_code
+
+                with CaptureQueriesContext(connection) as queries:
+                    make_request(method, url)
+                # Следующий запрос очистит журнал запросов, поэтому их число
+                # запоминается сразу.
+                query_count = len(queries)
+
+                tracemalloc.start()
+                make_request(method, url)
+                _, peak_memory = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                timings = []
+                for _ in range(repeat):
+                    request_started_at = time.perf_counter()
+                    make_request(method, url)
+                    timings.append((time.perf_counter() - request_started_at) * 1000)
+                timings.sort()
+
+                endpoints[f'{method} {url}'] = result = {
+                    'status': status_code,
+                    'queries': query_count,
+                    'peak_memory_kb': round(peak_memory / 1024),
+                    'p50_ms': round(get_percentile(timings, 50), 2),
+                    'p95_ms': round(get_percentile(timings, 95), 2),
+                    'p99_ms': round(get_percentile(timings, 99), 2),
+                    'mean_ms': round(sum(timings) / len(timings), 2),
+                }
+                self.stdout.write(
+                    f"{sizes['orders']} заказов, {method} {url}: "
+                    f"p50 {result['p50_ms']} мс, p99 {result['p99_ms']} мс, "
+                    f"запросов {result['queries']}, память {result['peak_memory_kb']} КБ"
+                )
+        return endpoints
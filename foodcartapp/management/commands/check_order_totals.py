@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Сверяет сохранённую стоимость заказов с суммой их позиций'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Пересчитать стоимость расходящихся заказов')
+
+    def handle(self, *args, **options):
+        mismatched_orders = (
+            Order.objects
+            .annotate_price()
+            .filter(~Q(total_price=F('price')) | Q(price__isnull=True, total_price__gt=0))
+        )
+        mismatched_ids = list(mismatched_orders.values_list('id', flat=True))
+        for order in mismatched_orders.filter(id__in=mismatched_ids[:20]):
+            self.stdout.write(
+                f"Заказ {order.id}: сохранено {order.total_price}, по позициям {order.price or 0}")
+        if not mismatched_ids:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        self.stdout.write(self.style.WARNING(f'Расходятся заказов: {len(mismatched_ids)}'))
+        if options['fix']:
+            Order.objects.filter(id__in=mismatched_ids).recalculate_total_price()
+            self.stdout.write(self.style.SUCCESS('Стоимость пересчитана'))
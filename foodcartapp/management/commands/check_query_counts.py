@@ -0,0 +1,109 @@
+import json
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from address_and_places.geocoder import get_geocode_cache
+from foodcartapp.catalogue import bump_catalogue_version
+from foodcartapp.matching import bump_menu_version
+from foodcartapp.synthetic import create_addresses, create_catalogue, create_orders
+
+
+# Сколько запросов к базе разрешено страницам при любом числе заказов.
+# Сессия и пользователь менеджера входят в счёт, а приём заказа внутри
+# транзакции команды открывает и закрывает точку сохранения.
+QUERY_BUDGETS = {
+    '/manager/orders/': 4,
+    '/manager/products/': 6,
+    '/api/products/': 1,
+    '/api/order/': 7,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверяет, что число запросов к базе у страниц заказов и товаров, '
+        'каталога и приёма заказа не растёт вместе с числом заказов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10, 1000, 10000],
+            help='Сколько заказов создать перед каждым замером')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            query_counts = self.measure(options['sizes'], random.Random(options['seed']))
+            transaction.set_rollback(True)
+        bump_menu_version()
+        get_geocode_cache().clear()
+        bump_catalogue_version()
+
+        failures = []
+        for url, counts in query_counts.items():
+            self.stdout.write(f'{url}: ' + ', '.join(
+                f'{size} заказов — {count}' for size, count in counts.items()))
+            if len(set(counts.values())) > 1:
+                failures.append(f'{url}: число запросов зависит от числа заказов')
+            if max(counts.values()) > QUERY_BUDGETS[url]:
+                failures.append(
+                    f'{url}: {max(counts.values())} запросов, '
+                    f'разрешено {QUERY_BUDGETS[url]}')
+        if failures:
+            raise CommandError('\n'.join(failures))
+
+    def measure(self, sizes, generator):
+        products, _ = create_catalogue(10, 50, menu_coverage=1, generator=generator)
+        # Координаты адресов сразу лежат в базе, чтобы замер не зависел от сети.
+        addresses = create_addresses(200, generator=generator)
+        manager = get_user_model().objects.create(
+            username='query-counts', is_staff=True)
+        client = Client()
+        client.force_login(manager)
+
+        query_counts = {url: {} for url in QUERY_BUDGETS}
+        with override_settings(ALLOWED_HOSTS=['*'], GEOCODE_IN_BACKGROUND=False):
+            created_count = 0
+            for size in sorted(sizes):
+                create_orders(
+                    size - created_count, products, addresses, generator=generator)
+                created_count = size
+                # Кэши процесса прогреваются первым запросом, считается второй.
+                client.get('/manager/orders/')
+                for url in ['/manager/orders/', '/manager/products/']:
+                    query_counts[url][size] = self.count_queries(
+                        lambda: client.get(url))
+
+                bump_catalogue_version()
+                query_counts['/api/products/'][size] = self.count_queries(
+                    lambda: client.get('/api/products/'))
+
+                order = {
+                    'firstname': 'Иван',
+                    'lastname': 'Петров',
+                    'phonenumber': '+79261234567',
+                    'address': 'Москва, ул. Тверская, 1',
+                    'products': [
+                        {'product': product.id, 'quantity': 1}
+                        for product in generator.sample(products, 3)
+                    ],
+                }
+                query_counts['/api/order/'][size] = self.count_queries(
+                    lambda: client.post(
+                        '/api/order/', json.dumps(order),
+                        content_type='application/json'))
+        return query_counts
+
+    def count_queries(self, make_request):
+        with CaptureQueriesContext(connection) as queries:
+            response = make_request()
+            if response.streaming:
+                b''.join(response.streaming_content)
+        if response.status_code >= 400:
+            raise CommandError(f'{response.status_code}: {response.content[:200]}')
+        return len(queries)
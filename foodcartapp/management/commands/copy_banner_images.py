@@ -0,0 +1,30 @@
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Banner
+
+
+ASSETS_DIR = os.path.join(settings.BASE_DIR, 'assets')
+
+
+class Command(BaseCommand):
+    help = 'Копирует в MEDIA_ROOT недостающие картинки баннеров из папки assets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assets-dir', default=ASSETS_DIR)
+
+    def handle(self, *args, **options):
+        copied_count = 0
+        image_names = Banner.objects.values_list('image', flat=True).distinct()
+        for image_name in image_names:
+            image_path = os.path.join(options['assets_dir'], image_name)
+            if default_storage.exists(image_name) or not os.path.isfile(image_path):
+                continue
+            with open(image_path, 'rb') as image:
+                default_storage.save(image_name, File(image))
+            copied_count += 1
+        self.stdout.write(f'Скопировано картинок: {copied_count}')
@@ -0,0 +1,173 @@
+import random
+import re
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from address_and_places.geocoder import get_geocode_cache
+from foodcartapp.catalogue import bump_catalogue_version
+from foodcartapp.matching import bump_menu_version
+from foodcartapp.models import Order, OrderItem
+from foodcartapp.synthetic import create_addresses, create_catalogue, create_orders
+
+
+# Строки плана, которые означают полный просмотр таблицы или индекса
+# и сортировку без индекса. Досортировка строк с одинаковым началом
+# ключа (RIGHT PART OF ORDER BY) не в счёт. Для других баз план
+# выводится без проверки.
+FULL_SCAN_PATTERNS = {
+    'sqlite': [
+        re.compile(r'\bSCAN (?:TABLE )?\w+(?: USING (?:COVERING )?INDEX (?P<index>\w+))?'),
+        re.compile(r'\bUSE TEMP B-TREE FOR ORDER BY\b'),
+    ],
+    'postgresql': [
+        re.compile(r'\bSeq Scan on \w+'),
+    ],
+}
+
+
+def get_partial_indexes():
+    """Частичные индексы: просмотреть такой индекс целиком — не полный просмотр таблицы."""
+    return {
+        index.name
+        for model in apps.get_models()
+        for index in model._meta.indexes
+        if index.condition is not None
+    }
+
+
+def get_hot_queries():
+    """Запросы доски заказов, распределения заказов и списка заказов в админке."""
+    order_ids = list(
+        Order.objects.unprocessed()
+        .order_by('registrated_at', 'id')
+        .values_list('id', flat=True)[:500]
+    ) or [0]
+    changes_since = timezone.now() - timedelta(seconds=settings.ORDER_BOARD_POLL_OVERLAP)
+    return {
+        'доска: необработанные заказы': (
+            Order.objects.unprocessed()
+            .select_related('restaurant')
+            .order_by('registrated_at', 'id')
+        ),
+        'доска: позиции заказов': (
+            OrderItem.objects
+            .filter(order_id__in=order_ids)
+            .only('id', 'order_id', 'product_id')
+        ),
+        'доска: изменения заказов': (
+            Order.objects
+            .filter(updated_at__gte=changes_since)
+            .select_related('restaurant')
+            .order_by('updated_at', 'id')[:settings.ORDER_BOARD_CHANGES_LIMIT]
+        ),
+        'распределение: заказы без ресторана': (
+            Order.objects.unprocessed()
+            .filter(restaurant__isnull=True)
+            .values_list('id', 'address', 'items__product_id')
+        ),
+        'распределение: загрузка ресторанов': (
+            Order.objects.unprocessed()
+            .filter(restaurant__isnull=False)
+            .values_list('restaurant')
+            .annotate(orders_count=Count('id'))
+        ),
+        'стоимость необработанных заказов': (
+            Order.objects.unprocessed().annotate_price()
+        ),
+        'админка: заказы': (
+            Order.objects
+            .select_related('restaurant')
+            .order_by('-registrated_at', '-id')[:100]
+        ),
+        'админка: обработанные заказы': (
+            Order.objects
+            .filter(status='PR')
+            .select_related('restaurant')
+            .order_by('-registrated_at', '-id')[:100]
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает планы выполнения горячих запросов к заказам и отмечает '
+        'полные просмотры таблиц'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--orders', type=int, default=0,
+            help='Создать столько тестовых заказов в транзакции, которая потом откатывается')
+        parser.add_argument(
+            '--processed-share', type=float, default=0.99,
+            help='Доля обработанных среди тестовых заказов')
+        parser.add_argument(
+            '--fail', action='store_true',
+            help='Завершиться с ошибкой, если найден полный просмотр таблицы')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['orders']:
+            with transaction.atomic():
+                generator = random.Random(options['seed'])
+                products, _ = create_catalogue(20, 200, generator=generator)
+                addresses = create_addresses(1000, generator=generator)
+                create_orders(
+                    options['orders'], products, addresses,
+                    processed_share=options['processed_share'], generator=generator)
+                self.analyze()
+                problems = self.explain_queries()
+                transaction.set_rollback(True)
+            bump_menu_version()
+            get_geocode_cache().clear()
+            bump_catalogue_version()
+        else:
+            problems = self.explain_queries()
+
+        if connection.vendor not in FULL_SCAN_PATTERNS:
+            self.stderr.write(f'Планы для {connection.vendor} не проверяются')
+        elif problems:
+            message = '\n'.join(problems)
+            if options['fail']:
+                raise CommandError(message)
+            self.stderr.write(message)
+        else:
+            self.stdout.write('Все запросы используют индексы')
+
+    def analyze(self):
+        # Без свежей статистики планировщик считает таблицы пустыми.
+        if connection.vendor in ('sqlite', 'postgresql'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def explain_queries(self):
+        order_count = Order.objects.count()
+        unprocessed_count = Order.objects.unprocessed().count()
+        self.stdout.write(
+            f'Заказов: {order_count}, необработанных: {unprocessed_count}\n')
+
+        problems = []
+        patterns = FULL_SCAN_PATTERNS.get(connection.vendor, [])
+        partial_indexes = get_partial_indexes()
+        for name, queryset in get_hot_queries().items():
+            plan = queryset.explain()
+            # Запрос с LIMIT идёт по индексу в нужном порядке и
+            # останавливается на первых строках.
+            is_limited = queryset.query.high_mark is not None
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan + '\n')
+            for line in plan.splitlines():
+                match = next(filter(None, (pattern.search(line) for pattern in patterns)), None)
+                if not match:
+                    continue
+                index = match.groupdict().get('index')
+                if index and (index in partial_indexes or is_limited):
+                    continue
+                problems.append(f'{name}: {line.strip()}')
+        return problems
@@ -0,0 +1,48 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from foodcartapp.synthetic import create_addresses, create_catalogue, create_orders
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими ресторанами, товарами, адресами и заказами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=100)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--menu-coverage', type=float, default=0.8,
+                            help='Доля товаров в меню каждого ресторана')
+        parser.add_argument('--addresses', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=10000)
+        parser.add_argument('--items', type=int, default=3,
+                            help='Позиций в каждом заказе')
+        parser.add_argument('--processed-share', type=float, default=0.5,
+                            help='Доля обработанных заказов')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        started_at = time.perf_counter()
+        with transaction.atomic():
+            products, restaurants = create_catalogue(
+                options['restaurants'], options['products'],
+                categories_count=options['categories'],
+                menu_coverage=options['menu_coverage'],
+                generator=generator,
+            )
+            addresses = create_addresses(options['addresses'], generator=generator)
+            orders = create_orders(
+                options['orders'], products, addresses,
+                items_per_order=options['items'],
+                processed_share=options['processed_share'],
+                generator=generator,
+            ) if products and addresses else []
+        self.stdout.write(
+            f"Ресторанов: {len(restaurants)}, товаров: {len(products)}, "
+            f"адресов: {len(addresses)}, заказов: {len(orders)} "
+            f"за {time.perf_counter() - started_at:.1f} с"
+        )
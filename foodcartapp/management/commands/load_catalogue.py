@@ -0,0 +1,64 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodcartapp.importers import CatalogueImporter
+from foodcartapp.models import RestaurantMenuItem
+
+
+DATA_DIR = os.path.join(settings.BASE_DIR, 'star-burger-products')
+
+
+class Command(BaseCommand):
+    help = 'Загружает товары и рестораны из JSON-файлов star-burger-products'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--products', default=os.path.join(DATA_DIR, 'products.json'),
+            help='JSON-массив товаров: title, type, price, img, description')
+        parser.add_argument(
+            '--restaurants', default=os.path.join(DATA_DIR, 'restaurants.json'),
+            help='JSON-массив ресторанов: title, address, contact_phone и '
+                 'необязательные latitude, longitude, menu')
+        parser.add_argument(
+            '--images-dir',
+            help='Папка с картинками товаров. Без неё поле img сохраняется как есть')
+        parser.add_argument(
+            '--full-menu', action='store_true',
+            help='Добавить в меню загруженных ресторанов все товары')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        importer = CatalogueImporter(
+            images_dir=options['images_dir'], batch_size=options['batch_size'])
+        menu_items_count = RestaurantMenuItem.objects.count()
+        started_at = time.perf_counter()
+        if options['products']:
+            with open(options['products'], encoding='utf-8') as file:
+                importer.load_products(file)
+        if options['restaurants']:
+            with open(options['restaurants'], encoding='utf-8') as file:
+                importer.load_restaurants(file)
+        if options['full_menu']:
+            importer.fill_menus()
+        importer.finish()
+        seconds = time.perf_counter() - started_at
+
+        stats = importer.stats
+        # Пункты меню вставляются с ignore_conflicts, поэтому новые
+        # считаются по разнице до и после загрузки.
+        stats['menu_items'] = RestaurantMenuItem.objects.count() - menu_items_count
+        rows_count = (
+            stats['categories_created'] + stats['products_created']
+            + stats['products_updated'] + stats['restaurants_created']
+            + stats['restaurants_updated'] + stats['menu_items']
+        )
+        for name, value in sorted(stats.items()):
+            self.stdout.write(f'{name}: {value}')
+        self.stdout.write(
+            f'Прочитано {stats["products_read"] + stats["restaurants_read"]} записей, '
+            f'записано {rows_count} строк за {seconds:.1f} с '
+            f'({rows_count / seconds if seconds else 0:.0f} строк/с)'
+        )
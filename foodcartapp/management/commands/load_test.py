@@ -0,0 +1,59 @@
+import asyncio
+import statistics
+import time
+
+import httpx
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Нагружает запущенный сайт параллельными запросами и меряет пропускную способность'
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', help='Например, http://127.0.0.1:8000')
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Какие адреса запрашивать, можно указать несколько раз')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=100)
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or ['/api/products/', '/api/banners/']
+        for path in paths:
+            latencies, failures, seconds = asyncio.run(self.run_load(
+                options['base_url'].rstrip('/') + path,
+                options['requests'], options['concurrency'], options['timeout'],
+            ))
+            latencies.sort()
+            self.stdout.write(
+                f"{path}: {len(latencies) / seconds:.0f} запросов/с, "
+                f"ошибок {failures}, "
+                f"p50 {statistics.median(latencies) * 1000:.1f} мс, "
+                f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} мс"
+                if latencies else f"{path}: все {failures} запросов завершились ошибкой"
+            )
+
+    async def run_load(self, url, requests_count, concurrency, timeout):
+        latencies = []
+        failures = 0
+        remaining_requests = iter(range(requests_count))
+
+        async def worker(client):
+            nonlocal failures
+            for _ in remaining_requests:
+                started_at = time.perf_counter()
+                try:
+                    response = await client.get(url, headers={'Accept-Encoding': 'gzip'})
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    failures += 1
+                    continue
+                latencies.append(time.perf_counter() - started_at)
+
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+            started_at = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+            seconds = time.perf_counter() - started_at
+        return latencies, failures, seconds
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from foodcartapp.archive import get_monthly_sales
+
+
+class Command(BaseCommand):
+    help = 'Печатает число обработанных заказов и выручку по месяцам вместе с архивом'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Начальная дата в формате ГГГГ-ММ-ДД')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = timezone.make_aware(datetime.fromisoformat(options['since']))
+            except ValueError:
+                raise CommandError('Дата должна быть в формате ГГГГ-ММ-ДД')
+
+        for month, orders_count, revenue in get_monthly_sales(since):
+            self.stdout.write(f'{month:%Y-%m}: заказов {orders_count}, выручка {revenue} руб.')
@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from .models import Restaurant, RestaurantMenuItem
+
+
+MENU_VERSION_KEY = 'foodcartapp:menu_version'
+
+
+class RestaurantMatcher:
+    """Отвечает на вопрос «какие рестораны могут приготовить заказ целиком».
+
+    Для каждого продукта хранится битовая маска ресторанов, у которых он
+    есть в продаже. Подходящие рестораны для заказа — побитовое И масок
+    всех продуктов заказа.
+    """
+
+    def __init__(self, restaurants, menu_items):
+        self.restaurants = list(restaurants)
+        self.restaurant_bits = {
+            restaurant.id: 1 << position
+            for position, restaurant in enumerate(self.restaurants)
+        }
+        self.all_restaurants_mask = (1 << len(self.restaurants)) - 1
+        self.product_masks = defaultdict(int)
+        for product_id, restaurant_id in menu_items:
+            restaurant_bit = self.restaurant_bits.get(restaurant_id)
+            if restaurant_bit:
+                self.product_masks[product_id] |= restaurant_bit
+        self._restaurants_by_mask = {}
+
+    @classmethod
+    def from_db(cls, restaurants=None):
+        if restaurants is None:
+            restaurants = Restaurant.objects.order_by('id')
+        restaurants = list(restaurants)
+        menu_items = (
+            RestaurantMenuItem.objects
+            .filter(availability=True, restaurant__in=restaurants)
+            .values_list('product_id', 'restaurant_id')
+        )
+        return cls(restaurants, menu_items)
+
+    def get_mask(self, product_ids):
+        mask = self.all_restaurants_mask
+        for product_id in product_ids:
+            mask &= self.product_masks.get(product_id, 0)
+            if not mask:
+                break
+        return mask
+
+    def decode_mask(self, mask):
+        if mask not in self._restaurants_by_mask:
+            self._restaurants_by_mask[mask] = [
+                restaurant for position, restaurant in enumerate(self.restaurants)
+                if mask >> position & 1
+            ]
+        return self._restaurants_by_mask[mask]
+
+    def match(self, product_ids):
+        return self.decode_mask(self.get_mask(product_ids))
+
+    def match_orders(self, products_of_orders):
+        """Принимает словарь {id заказа: id продуктов заказа}.
+
+        Возвращает словарь {id заказа: список подходящих ресторанов}.
+        Заказы с одинаковым набором ресторанов получают один и тот же список.
+        """
+        return {
+            order_id: self.match(product_ids)
+            for order_id, product_ids in products_of_orders.items()
+        }
+
+
+def bump_menu_version(**kwargs):
+    version = str(time.time_ns())
+    cache.set(MENU_VERSION_KEY, version, None)
+    return version
+
+
+def get_menu_version():
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        version = bump_menu_version()
+    return version
+
+
+_restaurant_matcher = None
+_restaurant_matcher_lock = threading.Lock()
+
+
+def get_restaurant_matcher():
+    """Возвращает RestaurantMatcher для текущей версии меню.
+
+    Матчер живёт в памяти процесса, а версия меню — в общем кэше, поэтому
+    изменение меню в одном процессе сбрасывает матчеры во всех.
+    """
+    global _restaurant_matcher
+    version = get_menu_version()
+    with _restaurant_matcher_lock:
+        if _restaurant_matcher is None or _restaurant_matcher[0] != version:
+            _restaurant_matcher = (version, RestaurantMatcher.from_db())
+        return _restaurant_matcher[1]
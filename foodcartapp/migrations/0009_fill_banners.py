@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+BANNERS = [
+    ('Burger', 'burger.jpg', 'Tasty Burger at your door step'),
+    ('Spices', 'food.jpg', 'All Cuisines'),
+    ('New York', 'tasty.jpg', 'Food is incomplete without a tasty dessert'),
+]
+
+
+def fill_banners(apps, schema_editor):
+    # Картинки из assets копирует в MEDIA_ROOT команда copy_banner_images,
+    # чтобы миграции не писали файлы.
+    Banner = apps.get_model('foodcartapp', 'Banner')
+    for position, (title, image_name, text) in enumerate(BANNERS):
+        Banner.objects.create(
+            title=title, text=text, image=image_name, position=position)
+
+
+def delete_banners(apps, schema_editor):
+    Banner = apps.get_model('foodcartapp', 'Banner')
+    Banner.objects.filter(title__in=[title for title, _, _ in BANNERS]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0008_banner'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_banners, delete_banners),
+    ]
@@ -0,0 +1,29 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_total_price(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    OrderItem = apps.get_model('foodcartapp', 'OrderItem')
+    items_price = (
+        OrderItem.objects
+        .filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(price=Sum('total_product_price'))
+        .values('price')
+    )
+    Order.objects.update(total_price=Coalesce(Subquery(items_price), Decimal(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0010_order_total_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_total_price, migrations.RunPython.noop),
+    ]
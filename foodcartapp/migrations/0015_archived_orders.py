@@ -0,0 +1,54 @@
+# Generated by Django 3.2 on 2026-10-18 20:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import phonenumber_field.modelfields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0014_order_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('firstname', models.CharField(max_length=50, verbose_name='Имя')),
+                ('lastname', models.CharField(max_length=50, verbose_name='Фамилия')),
+                ('phonenumber', phonenumber_field.modelfields.PhoneNumberField(db_index=True, max_length=128, region=None, verbose_name='Номер телефона')),
+                ('address', models.CharField(max_length=100, verbose_name='Адрес')),
+                ('status', models.CharField(choices=[('PR', 'Processed'), ('UNPR', 'Unprocessed')], max_length=4, verbose_name='Статус заказа')),
+                ('comment', models.TextField(blank=True, verbose_name='Комментарий к заказу')),
+                ('registrated_at', models.DateTimeField(db_index=True, verbose_name='Зарегистрирован в')),
+                ('called_at', models.DateTimeField(blank=True, null=True, verbose_name='Позвонили в')),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name='Доставлен в')),
+                ('updated_at', models.DateTimeField(verbose_name='Изменён в')),
+                ('payment_method', models.CharField(choices=[('cash', 'Cash'), ('card', 'Card'), ('ns', 'not specified')], max_length=15, verbose_name='Способ оплаты')),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Стоимость заказа')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Перенесён в архив')),
+                ('restaurant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders', to='foodcartapp.restaurant', verbose_name='Обслуживающий ресторан')),
+            ],
+            options={
+                'verbose_name': 'Архивный заказ',
+                'verbose_name_plural': 'Архив заказов',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(verbose_name='Количество товара')),
+                ('total_product_price', models.DecimalField(decimal_places=2, max_digits=7, verbose_name='Цена товара c учетом количества')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='foodcartapp.archivedorder', verbose_name='Заказ')),
+                ('product', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_order_items', to='foodcartapp.product', verbose_name='Продукт')),
+            ],
+            options={
+                'verbose_name': 'Элемент архивного заказа',
+                'verbose_name_plural': 'Элементы архивного заказа',
+            },
+        ),
+    ]
@@ -2,17 +2,31 @@ from django.db import models
 from django.core.validators import MinValueValidator
 from phonenumber_field.modelfields import PhoneNumberField
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from decimal import Decimal
 
 
 class RestaurantQuerySet(models.QuerySet):
-    def get_products_of_restaurants(self):
-        restaurants = self.prefetch_related("menu_items")
-        products_of_restaurants = []
-        for restaurant in restaurants:
-            products_of_restaurant = {'restaurant': restaurant, "products_ids": [restaurant.product_id for restaurant in restaurant.menu_items.all()]}
-            products_of_restaurants.append(products_of_restaurant)
-        return products_of_restaurants
+    def restaurants_serving_all(self, product_ids):
+        """Рестораны, у которых в продаже есть все продукты `product_ids`.
+
+        Считается в базе одним запросом с GROUP BY и HAVING, меню целиком не
+        загружаются. Тот же ответ из памяти даёт
+        `foodcartapp.matching.get_restaurant_matcher().match(product_ids)`.
+        """
+        product_ids = set(product_ids)
+        if not product_ids:
+            return self.all()
+        return (
+            self
+            .filter(
+                menu_items__product_id__in=product_ids,
+                menu_items__availability=True,
+            )
+            .annotate(served_products_count=Count('menu_items'))
+            .filter(served_products_count=len(product_ids))
+        )
 
 
 class Restaurant(models.Model):
@@ -39,6 +53,12 @@ class Restaurant(models.Model):
         verbose_name="широта",
         max_digits=10,
         decimal_places=8)
+    order_capacity = models.PositiveIntegerField(
+        'сколько заказов может готовить одновременно',
+        null=True,
+        blank=True,
+        help_text='Пусто — без ограничений',
+    )
     objects = RestaurantQuerySet.as_manager()
 
     class Meta:
@@ -146,24 +166,73 @@ class RestaurantMenuItem(models.Model):
         return f"{self.restaurant.name} - {self.product.name}"
 
 
+class Banner(models.Model):
+    title = models.CharField(
+        'заголовок',
+        max_length=50
+    )
+    text = models.CharField(
+        'текст',
+        max_length=200,
+        blank=True,
+    )
+    image = models.ImageField(
+        'картинка'
+    )
+    position = models.PositiveIntegerField(
+        'порядок',
+        default=0,
+        db_index=True,
+    )
+    is_active = models.BooleanField(
+        'показывать',
+        default=True,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'баннер'
+        verbose_name_plural = 'баннеры'
+        ordering = ['position', 'id']
+
+    def __str__(self):
+        return self.title
+
+
 class OrderQuerySet(models.QuerySet):
+    def unprocessed(self):
+        return self.filter(status="UNPR")
+
     def annotate_price(self):
         price = self.annotate(price=Sum("items__total_product_price"))
         return price
 
-    def select_suitable_restaurants_for_orders(self, products_of_restaurants):
-        suitable_restaurants_for_orders = []
-        for order in self:
-            suitable_restaurants = []
-            order_items = order.items.all()
-            products_of_order = [order_item.product_id for order_item in order_items]
-            for products_of_restaurant in products_of_restaurants:
-                if all(product in products_of_restaurant["products_ids"]
-                       for product in products_of_order):
-                    suitable_restaurants.append(products_of_restaurant["restaurant"])
-            suitable_restaurants = {"order_id": order.id, "suitable_restaurants": suitable_restaurants}
-            suitable_restaurants_for_order.append(suitable_restaurants)
-        return suitable_restaurants_for_orders
+    def recalculate_total_price(self):
+        items_price = (
+            OrderItem.objects
+            .filter(order=OuterRef("pk"))
+            .values("order")
+            .annotate(price=Sum("total_product_price"))
+            .values("price")
+        )
+        return self.update(
+            total_price=Coalesce(Subquery(items_price), Decimal(0)),
+            updated_at=timezone.now(),
+        )
+
+    def select_suitable_restaurants_for_orders(self, matcher):
+        # Продукты всех заказов читаются одним запросом, даже если
+        # позиции заказов не были загружены через prefetch_related.
+        orders = self
+        if self.query.is_sliced:
+            # Срез страницы ограничил бы строки позиций, а не заказы.
+            orders = self.model.objects.filter(id__in=self.values("id"))
+        products_of_orders = {}
+        for order_id, product_id in orders.values_list("id", "items__product_id"):
+            products_of_order = products_of_orders.setdefault(order_id, set())
+            if product_id is not None:
+                products_of_order.add(product_id)
+        return matcher.match_orders(products_of_orders)
 
 
 class Order(models.Model):
@@ -180,8 +249,7 @@ class Order(models.Model):
         verbose_name="Статус заказа",
         max_length=4,
         choices=STATUS_CHOICES,
-        default="UNPR",
-        db_index=True)
+        default="UNPR")
     comment = models.TextField(verbose_name="Комментарий к заказу", blank=True)
     registrated_at = models.DateTimeField(
         verbose_name="Зарегистрирован в",
@@ -197,6 +265,10 @@ class Order(models.Model):
         blank=True,
         null=True,
         db_index=True)
+    updated_at = models.DateTimeField(
+        verbose_name="Изменён в",
+        auto_now=True,
+        db_index=True)
     payment_method = models.CharField(
         verbose_name="Способ оплаты",
         max_length=15,
@@ -211,11 +283,33 @@ class Order(models.Model):
         blank=True,
         on_delete=models.SET_NULL,
         )
+    total_price = models.DecimalField(
+        verbose_name="Стоимость заказа",
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        validators=[
+            MinValueValidator(0)])
     objects = OrderQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
+        indexes = [
+            # Доска заказов и распределение по ресторанам читают только
+            # необработанные заказы, а их всегда немного.
+            models.Index(
+                fields=["registrated_at", "id"],
+                condition=models.Q(status="UNPR"),
+                name="order_unprocessed_idx",
+            ),
+            # Списки заказов с фильтром по статусу, новые первыми. Заодно
+            # заменяет отдельный индекс по статусу.
+            models.Index(
+                fields=["status", "-registrated_at"],
+                name="order_status_registrated_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.firstname} {self.lastname}"
@@ -245,6 +339,96 @@ class OrderItem(models.Model):
     class Meta:
         verbose_name = "Элементы заказа"
         verbose_name_plural = "Элемент заказа"
+        indexes = [
+            models.Index(
+                fields=["order", "product"],
+                name="orderitem_order_product_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.order}"
+
+
+class ArchivedOrder(models.Model):
+    """Обработанный заказ, перенесённый из рабочей таблицы командой archive_orders.
+
+    Поля повторяют `Order`, id заказа сохраняется.
+    """
+    id = models.IntegerField(primary_key=True, verbose_name="ID")
+    firstname = models.CharField(verbose_name="Имя", max_length=50)
+    lastname = models.CharField(verbose_name="Фамилия", max_length=50)
+    phonenumber = PhoneNumberField(
+        verbose_name="Номер телефона", db_index=True)
+    address = models.CharField(verbose_name="Адрес", max_length=100)
+    status = models.CharField(
+        verbose_name="Статус заказа",
+        max_length=4,
+        choices=Order.STATUS_CHOICES)
+    comment = models.TextField(verbose_name="Комментарий к заказу", blank=True)
+    registrated_at = models.DateTimeField(
+        verbose_name="Зарегистрирован в",
+        db_index=True)
+    called_at = models.DateTimeField(
+        verbose_name="Позвонили в",
+        blank=True,
+        null=True)
+    delivered_at = models.DateTimeField(
+        verbose_name="Доставлен в",
+        blank=True,
+        null=True)
+    updated_at = models.DateTimeField(verbose_name="Изменён в")
+    payment_method = models.CharField(
+        verbose_name="Способ оплаты",
+        max_length=15,
+        choices=Order.PAYMENT_METHOD_CHOICES)
+    restaurant = models.ForeignKey(
+        Restaurant,
+        verbose_name="Обслуживающий ресторан",
+        related_name="archived_orders",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        )
+    total_price = models.DecimalField(
+        verbose_name="Стоимость заказа",
+        max_digits=10,
+        decimal_places=2)
+    archived_at = models.DateTimeField(
+        verbose_name="Перенесён в архив",
+        default=timezone.now)
+
+    class Meta:
+        verbose_name = "Архивный заказ"
+        verbose_name_plural = "Архив заказов"
+
+    def __str__(self):
+        return f"{self.firstname} {self.lastname}"
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.IntegerField(primary_key=True, verbose_name="ID")
+    order = models.ForeignKey(
+        ArchivedOrder,
+        verbose_name="Заказ",
+        related_name="items",
+        on_delete=models.CASCADE)
+    # Архив остаётся историей продаж и после удаления товара из каталога.
+    product = models.ForeignKey(
+        Product,
+        verbose_name="Продукт",
+        related_name="archived_order_items",
+        null=True,
+        on_delete=models.SET_NULL)
+    quantity = models.IntegerField(verbose_name="Количество товара")
+    total_product_price = models.DecimalField(
+        verbose_name="Цена товара c учетом количества",
+        max_digits=7,
+        decimal_places=2)
+
+    class Meta:
+        verbose_name = "Элемент архивного заказа"
+        verbose_name_plural = "Элементы архивного заказа"
 
     def __str__(self):
         return f"{self.order}"
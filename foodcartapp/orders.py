@@ -0,0 +1,40 @@
+from django.db import connection, transaction
+
+from .models import Order, OrderItem
+from .signals import orders_created
+
+
+def create_orders(orders_data):
+    """Сохраняет провалидированные OrderSerializer заказы вместе с их позициями.
+
+    Заказы вставляются одним запросом, если база умеет возвращать id
+    вставленных строк, позиции всех заказов — одним bulk_create.
+    """
+    orders = [
+        Order(
+            firstname=order_data["firstname"],
+            lastname=order_data["lastname"],
+            phonenumber=order_data["phonenumber"],
+            address=order_data["address"],
+            total_price=sum(
+                product['quantity'] * product['product'].price
+                for product in order_data['products']
+            ),
+        )
+        for order_data in orders_data
+    ]
+    if connection.features.can_return_rows_from_bulk_insert:
+        Order.objects.bulk_create(orders)
+    else:
+        for order in orders:
+            order.save()
+
+    order_items = [
+        OrderItem(
+            order=order, total_product_price=product['quantity'] * product['product'].price, **product)
+        for order, order_data in zip(orders, orders_data)
+        for product in order_data['products']
+    ]
+    OrderItem.objects.bulk_create(order_items)
+    transaction.on_commit(lambda: orders_created.send(sender=Order, orders=orders))
+    return orders
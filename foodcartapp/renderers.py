@@ -0,0 +1,51 @@
+import gzip
+import json
+import re
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def dumps(data):
+    if settings.API_PRETTY_JSON:
+        return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, indent=4)
+    return json.dumps(
+        data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def iter_json_array(items, serialize, chunk_size=100):
+    """Отдаёт JSON-массив кусками байтов, не собирая его в памяти целиком."""
+    yield b'['
+    chunk = []
+    is_first = True
+    for item in items:
+        chunk.append(dumps(serialize(item)))
+        if len(chunk) >= chunk_size:
+            yield (('' if is_first else ',') + ','.join(chunk)).encode()
+            is_first = False
+            chunk = []
+    if chunk:
+        yield (('' if is_first else ',') + ','.join(chunk)).encode()
+    yield b']'
+
+
+def get_accepted_encoding(request):
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if brotli and re.search(r'\bbr\b', accept_encoding):
+        return 'br'
+    if re.search(r'\bgzip\b', accept_encoding):
+        return 'gzip'
+    return None
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content)
+    if encoding == 'gzip':
+        return gzip.compress(content, mtime=0)
+    return content
@@ -1,10 +1,52 @@
-from django.http import JsonResponse
-from django.templatetags.static import static
 from .models import Product, Order, OrderItem
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import IntegerField
+from rest_framework.relations import PrimaryKeyRelatedField
 from rest_framework.serializers import ModelSerializer
 
 
+# Id вне диапазона столбца база не примет: SQLite бросает OverflowError.
+PRODUCT_ID_FIELD = IntegerField(min_value=1, max_value=2 ** 31 - 1)
+
+
+def get_product_id(data):
+    try:
+        return PRODUCT_ID_FIELD.run_validation(data)
+    except ValidationError:
+        return None
+
+
+class ProductField(PrimaryKeyRelatedField):
+    """Берёт продукты из `context['products']`, если их загрузили заранее."""
+
+    def to_internal_value(self, data):
+        product_id = PRODUCT_ID_FIELD.run_validation(data)
+        products = self.context.get('products')
+        if products is None:
+            return super().to_internal_value(product_id)
+        if product_id not in products:
+            self.fail('does_not_exist', pk_value=data)
+        return products[product_id]
+
+
+def load_products_of_orders(orders_data):
+    """Одним запросом загружает все продукты, упомянутые в заказах."""
+    product_ids = set()
+    for order_data in orders_data:
+        if not isinstance(order_data, dict) or not isinstance(order_data.get('products'), list):
+            continue
+        for item in order_data['products']:
+            if not isinstance(item, dict):
+                continue
+            product_id = get_product_id(item.get('product'))
+            if product_id is not None:
+                product_ids.add(product_id)
+    return Product.objects.in_bulk(product_ids)
+
+
 class OrderItemSerializer(ModelSerializer):
+    product = ProductField(queryset=Product.objects.all())
+
     class Meta:
         model = OrderItem
         fields = ["quantity", "product"]
@@ -0,0 +1,41 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .banners import bump_banners_version
+from .catalogue import bump_catalogue_version
+from .matching import bump_menu_version
+from .models import Banner, Product, ProductCategory, Restaurant, RestaurantMenuItem
+
+
+# Отправляется после коммита транзакции, в которой созданы заказы `orders`.
+orders_created = Signal()
+# Отправляется после коммита транзакции, в которой заказы `order_ids` изменены
+# без вызова save(), например bulk_update.
+orders_updated = Signal()
+# Отправляется внутри транзакции, в которой заказы `order_ids` удалены без
+# сигналов post_delete, например переносом в архив.
+orders_deleted = Signal()
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def reset_menu(sender, **kwargs):
+    bump_menu_version()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def reset_catalogue(sender, **kwargs):
+    bump_catalogue_version()
+
+
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+def reset_banners(sender, **kwargs):
+    bump_banners_version()
@@ -0,0 +1,193 @@
+import math
+import threading
+from collections import defaultdict
+
+from address_and_places.distances import haversine_matrix
+
+from .matching import get_menu_version, get_restaurant_matcher
+
+
+KM_PER_DEGREE = 111.19
+
+
+class RestaurantIndex:
+    """Сетка ресторанов для поиска ближайших и поиска в радиусе.
+
+    Рестораны раскладываются по ячейкам примерно `cell_size_km` на
+    `cell_size_km`. Поиск обходит кольца ячеек вокруг точки и
+    останавливается, как только следующие кольца заведомо дальше уже
+    найденных ресторанов. Если точка далеко от всех ресторанов и колец
+    пришлось бы обойти больше, чем занято ячеек, оставшиеся рестораны
+    измеряются все сразу.
+    """
+
+    def __init__(self, restaurants, matcher=None, cell_size_km=2.0):
+        self.restaurants = [
+            restaurant for restaurant in restaurants
+            if restaurant.latitude is not None and restaurant.longitude is not None
+        ]
+        self.matcher = matcher
+        self.cell_size_km = cell_size_km
+        self.max_latitude = min(
+            max((abs(float(restaurant.latitude)) for restaurant in self.restaurants), default=0),
+            80,
+        )
+        self.latitude_step = cell_size_km / KM_PER_DEGREE
+        self.longitude_step = self.latitude_step / math.cos(math.radians(self.max_latitude))
+
+        self.cells = defaultdict(list)
+        for restaurant in self.restaurants:
+            cell = self.get_cell(float(restaurant.latitude), float(restaurant.longitude))
+            self.cells[cell].append(restaurant)
+        rows = [row for row, _ in self.cells] or [0]
+        columns = [column for _, column in self.cells] or [0]
+        self.bounds = (min(rows), max(rows), min(columns), max(columns))
+
+    @classmethod
+    def from_db(cls, cell_size_km=2.0):
+        matcher = get_restaurant_matcher()
+        return cls(matcher.restaurants, matcher=matcher, cell_size_km=cell_size_km)
+
+    def get_cell(self, lat, lon):
+        return (
+            math.floor(lat / self.latitude_step),
+            math.floor(lon / self.longitude_step),
+        )
+
+    def _get_ring(self, center, radius):
+        row, column = center
+        if radius == 0:
+            return self.cells.get(center, [])
+        restaurants = []
+        for ring_row in range(row - radius, row + radius + 1):
+            if ring_row in (row - radius, row + radius):
+                ring_columns = range(column - radius, column + radius + 1)
+            else:
+                ring_columns = (column - radius, column + radius)
+            for ring_column in ring_columns:
+                restaurants.extend(self.cells.get((ring_row, ring_column), []))
+        return restaurants
+
+    def _get_outside(self, center, radius):
+        """Рестораны из занятых ячеек дальше `radius` колец от центра."""
+        row, column = center
+        return [
+            restaurant
+            for (cell_row, cell_column), restaurants in self.cells.items()
+            if max(abs(cell_row - row), abs(cell_column - column)) > radius
+            for restaurant in restaurants
+        ]
+
+    def _is_ring_walk_too_long(self, radius):
+        # Обход колец до `radius` просматривает порядка radius**2 ячеек,
+        # дешевле перебрать только занятые.
+        return radius ** 2 > len(self.cells)
+
+    def _get_max_radius(self, center):
+        min_row, max_row, min_column, max_column = self.bounds
+        row, column = center
+        return max(
+            abs(row - min_row), abs(row - max_row),
+            abs(column - min_column), abs(column - max_column),
+        )
+
+    def _get_ring_distance_km(self, lat, radius):
+        # Любой ресторан за пределами уже обойдённых `radius` колец
+        # отстоит от точки не меньше чем на столько километров.
+        shrink = min(1, math.cos(math.radians(min(abs(lat), 89))) / math.cos(math.radians(self.max_latitude)))
+        return radius * self.cell_size_km * shrink
+
+    def _get_allowed_mask(self, product_ids):
+        if product_ids is None or self.matcher is None:
+            return None
+        return self.matcher.get_mask(product_ids)
+
+    def _filter(self, restaurants, allowed_mask):
+        if allowed_mask is None:
+            return restaurants
+        restaurant_bits = self.matcher.restaurant_bits
+        return [
+            restaurant for restaurant in restaurants
+            if allowed_mask & restaurant_bits.get(restaurant.id, 0)
+        ]
+
+    def _measure(self, lat, lon, restaurants):
+        if not restaurants:
+            return []
+        distances = haversine_matrix(
+            [(lat, lon)],
+            [(float(restaurant.latitude), float(restaurant.longitude)) for restaurant in restaurants],
+        )[0]
+        return [
+            (restaurant, float(restaurant_distance))
+            for restaurant, restaurant_distance in zip(restaurants, distances)
+        ]
+
+    def nearest(self, lat, lon, k, product_ids=None):
+        """Возвращает до k ближайших ресторанов как [(ресторан, км), ...].
+
+        Если переданы `product_ids`, учитываются только рестораны, у которых
+        все эти продукты есть в продаже.
+        """
+        lat, lon = float(lat), float(lon)
+        allowed_mask = self._get_allowed_mask(product_ids)
+        if allowed_mask == 0 or k <= 0:
+            return []
+        center = self.get_cell(lat, lon)
+        max_radius = self._get_max_radius(center)
+        found = []
+        for radius in range(max_radius + 1):
+            if self._is_ring_walk_too_long(radius):
+                outside = self._filter(self._get_outside(center, radius - 1), allowed_mask)
+                found.extend(self._measure(lat, lon, outside))
+                break
+            ring = self._filter(self._get_ring(center, radius), allowed_mask)
+            found.extend(self._measure(lat, lon, ring))
+            if len(found) >= k:
+                found.sort(key=lambda item: item[1])
+                del found[k:]
+                if found[-1][1] <= self._get_ring_distance_km(lat, radius):
+                    break
+        found.sort(key=lambda item: item[1])
+        return found[:k]
+
+    def within(self, lat, lon, radius_km, product_ids=None):
+        """Возвращает рестораны не дальше `radius_km` от точки, ближайшие первыми."""
+        lat, lon = float(lat), float(lon)
+        allowed_mask = self._get_allowed_mask(product_ids)
+        if allowed_mask == 0:
+            return []
+        center = self.get_cell(lat, lon)
+        max_radius = self._get_max_radius(center)
+        found = []
+        for radius in range(max_radius + 1):
+            if self._get_ring_distance_km(lat, radius - 1) > radius_km:
+                break
+            is_last_walk = self._is_ring_walk_too_long(radius)
+            if is_last_walk:
+                ring = self._filter(self._get_outside(center, radius - 1), allowed_mask)
+            else:
+                ring = self._filter(self._get_ring(center, radius), allowed_mask)
+            found.extend(
+                (restaurant, restaurant_distance)
+                for restaurant, restaurant_distance in self._measure(lat, lon, ring)
+                if restaurant_distance <= radius_km
+            )
+            if is_last_walk:
+                break
+        found.sort(key=lambda item: item[1])
+        return found
+
+
+_restaurant_index = None
+_restaurant_index_lock = threading.Lock()
+
+
+def get_restaurant_index():
+    """Возвращает индекс ресторанов для текущей версии меню."""
+    global _restaurant_index
+    version = get_menu_version()
+    with _restaurant_index_lock:
+        if _restaurant_index is None or _restaurant_index[0] != version:
+            _restaurant_index = (version, RestaurantIndex.from_db())
+        return _restaurant_index[1]
@@ -0,0 +1,141 @@
+import random
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from address_and_places.models import Address
+
+from .catalogue import bump_catalogue_version
+from .matching import bump_menu_version
+from .models import (
+    Order, OrderItem, Product, ProductCategory, Restaurant, RestaurantMenuItem,
+)
+
+
+BATCH_SIZE = 1000
+STREETS = [
+    'Тверская', 'Арбат', 'Мясницкая', 'Покровка', 'Лесная', 'Садовая',
+    'Профсоюзная', 'Ленинский проспект', 'Вавилова', 'Новослободская',
+]
+# Окрестности Москвы: (широта, долгота) юго-западного и северо-восточного углов.
+BOUNDS = ((55.5, 37.3), (55.9, 37.9))
+
+
+def bulk_create(model, objects, batch_size=BATCH_SIZE):
+    """bulk_create, который возвращает объекты с id и на SQLite."""
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objects, batch_size=batch_size)
+    last_id = model.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    model.objects.bulk_create(objects, batch_size=batch_size)
+    return list(model.objects.filter(id__gt=last_id).order_by('id'))
+
+
+def get_random_point(generator):
+    (min_lat, min_lon), (max_lat, max_lon) = BOUNDS
+    return (
+        round(generator.uniform(min_lat, max_lat), 8),
+        round(generator.uniform(min_lon, max_lon), 8),
+    )
+
+
+def create_catalogue(restaurants_count, products_count, categories_count=10,
+                     menu_coverage=0.8, generator=random):
+    """Создаёт категории, товары, рестораны с координатами и их меню.
+
+    Каждый ресторан продаёт примерно `menu_coverage` всех товаров.
+    Возвращает списки товаров и ресторанов.
+    """
+    categories = bulk_create(ProductCategory, [
+        ProductCategory(name=f'Категория {number}')
+        for number in range(categories_count)
+    ])
+    products = bulk_create(Product, [
+        Product(
+            name=f'Товар {number}',
+            category=generator.choice(categories) if categories else None,
+            price=Decimal(generator.randint(50, 1500)),
+            image='synthetic.jpg',
+            special_status=generator.random() < 0.05,
+        )
+        for number in range(products_count)
+    ])
+    restaurants = []
+    for number in range(restaurants_count):
+        latitude, longitude = get_random_point(generator)
+        restaurants.append(Restaurant(
+            name=f'Ресторан {number}',
+            address=f'Москва, ул. {generator.choice(STREETS)}, {number + 1}',
+            latitude=latitude,
+            longitude=longitude,
+        ))
+    restaurants = bulk_create(Restaurant, restaurants)
+
+    menu_items = []
+    for restaurant in restaurants:
+        for product in products:
+            if generator.random() < menu_coverage:
+                menu_items.append(RestaurantMenuItem(
+                    restaurant=restaurant,
+                    product=product,
+                    availability=generator.random() < 0.9,
+                ))
+        if len(menu_items) >= BATCH_SIZE:
+            RestaurantMenuItem.objects.bulk_create(menu_items, batch_size=BATCH_SIZE)
+            menu_items = []
+    RestaurantMenuItem.objects.bulk_create(menu_items, batch_size=BATCH_SIZE)
+
+    # bulk_create не посылает сигналов, поэтому кэши сбрасываются вручную.
+    bump_catalogue_version()
+    bump_menu_version()
+    return products, restaurants
+
+
+def create_addresses(count, generator=random):
+    """Создаёт адреса вместе с координатами, чтобы их не пришлось геокодировать."""
+    addresses = {
+        f'Москва, ул. {generator.choice(STREETS)}, {number + 1}'
+        for number in range(count)
+    }
+    now = timezone.now()
+    places = []
+    for address in sorted(addresses):
+        latitude, longitude = get_random_point(generator)
+        places.append(Address(
+            address=address, latitude=latitude, longitude=longitude,
+            date_of_request=now))
+    Address.objects.bulk_create(places, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return sorted(addresses)
+
+
+def create_orders(count, products, addresses, items_per_order=3,
+                  processed_share=0.0, generator=random):
+    """Создаёт заказы с позициями и посчитанной стоимостью."""
+    items_per_order = min(items_per_order, len(products))
+    items_of_orders = []
+    orders = []
+    for _ in range(count):
+        items = [
+            (product, generator.randint(1, 3))
+            for product in generator.sample(products, items_per_order)
+        ]
+        items_of_orders.append(items)
+        orders.append(Order(
+            firstname='Иван',
+            lastname='Петров',
+            phonenumber='+79261234567',
+            address=generator.choice(addresses),
+            status='PR' if generator.random() < processed_share else 'UNPR',
+            total_price=sum(product.price * quantity for product, quantity in items),
+        ))
+    orders = bulk_create(Order, orders)
+
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order, product=product, quantity=quantity,
+            total_product_price=product.price * quantity)
+        for order, items in zip(orders, items_of_orders)
+        for product, quantity in items
+    ], batch_size=BATCH_SIZE)
+    return orders
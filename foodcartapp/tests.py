@@ -0,0 +1,998 @@
+import asyncio
+import io
+import itertools
+import json
+import math
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+from importlib import import_module
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from address_and_places.distances import haversine_matrix
+
+from .archive import archive_orders, get_monthly_sales
+from .assignment import assign, assign_unprocessed_orders
+from .banners import bump_banners_version, get_rendered_banners
+from .catalogue import bump_catalogue_version
+from .changelists import EstimatedCountPaginator
+from .matching import RestaurantMatcher, bump_menu_version, get_menu_version, get_restaurant_matcher
+from .importers import iter_json_array_file
+from .models import ArchivedOrder, ArchivedOrderItem, Banner, Order, OrderItem
+from .models import Product, Restaurant, RestaurantMenuItem
+from .orders import create_orders as create_validated_orders
+from .spatial import RestaurantIndex, get_restaurant_index
+from .views import async_product_list_api
+from .synthetic import create_addresses, create_catalogue, create_orders
+
+
+@override_settings(
+    GEOCODER_BACKEND='address_and_places.geocoder.StubGeocoder',
+    GEOCODE_IN_BACKGROUND=False,
+)
+class RestaurantMatcherTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generator = random.Random(0)
+        products, _ = create_catalogue(8, 30, menu_coverage=0.7, generator=generator)
+        addresses = create_addresses(20, generator=generator)
+        create_orders(200, products, addresses, items_per_order=2, generator=generator)
+
+    def get_products_of_orders(self):
+        return {
+            order.id: {item.product_id for item in order.items.all()}
+            for order in Order.objects.prefetch_related('items')
+        }
+
+    def test_match_orders_agrees_with_database(self):
+        products_of_orders = self.get_products_of_orders()
+
+        suitable_restaurants_for_orders = RestaurantMatcher.from_db().match_orders(products_of_orders)
+
+        for order_id, product_ids in products_of_orders.items():
+            self.assertEqual(
+                {restaurant.id for restaurant in suitable_restaurants_for_orders[order_id]},
+                set(Restaurant.objects.restaurants_serving_all(product_ids).values_list('id', flat=True)),
+            )
+
+    def test_match_orders_does_not_query_per_order(self):
+        products_of_orders = self.get_products_of_orders()
+        matcher = RestaurantMatcher.from_db()
+
+        with self.assertNumQueries(0):
+            suitable_restaurants_for_orders = matcher.match_orders(products_of_orders)
+
+        self.assertEqual(len(suitable_restaurants_for_orders), 200)
+
+    def test_select_suitable_restaurants_for_orders_reads_page_in_one_query(self):
+        matcher = RestaurantMatcher.from_db()
+        products_of_orders = self.get_products_of_orders()
+
+        for orders_count in [10, 200]:
+            orders = Order.objects.order_by('id')[:orders_count]
+            with self.subTest(orders_count=orders_count), self.assertNumQueries(1):
+                suitable_restaurants_for_orders = orders.select_suitable_restaurants_for_orders(matcher)
+            self.assertEqual(len(suitable_restaurants_for_orders), orders_count)
+            for order_id, suitable_restaurants in suitable_restaurants_for_orders.items():
+                self.assertEqual(suitable_restaurants, matcher.match(products_of_orders[order_id]))
+
+
+class MenuVersionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products, cls.restaurants = create_catalogue(
+            3, 4, menu_coverage=1, generator=random.Random(0))
+        RestaurantMenuItem.objects.update(availability=True)
+        bump_menu_version()
+
+    def get_served_ids(self, products):
+        return set(
+            Restaurant.objects
+            .restaurants_serving_all([product.id for product in products])
+            .values_list('id', flat=True)
+        )
+
+    def test_restaurants_serving_all(self):
+        first, second, third = self.restaurants
+        RestaurantMenuItem.objects.filter(restaurant=first, product=self.products[0]).delete()
+        RestaurantMenuItem.objects.filter(restaurant=second, product=self.products[1]).update(
+            availability=False)
+        all_ids = {restaurant.id for restaurant in self.restaurants}
+
+        self.assertEqual(self.get_served_ids([]), all_ids)
+        self.assertEqual(self.get_served_ids(self.products[2:]), all_ids)
+        self.assertEqual(self.get_served_ids(self.products[:1]), {second.id, third.id})
+        self.assertEqual(self.get_served_ids(self.products[:2]), {third.id})
+        # Повтор товара в заказе не меняет ответ.
+        self.assertEqual(self.get_served_ids(self.products[:2] * 2), {third.id})
+
+        product = Product.objects.create(name='Не в меню', price=1)
+        self.assertEqual(self.get_served_ids([product]), set())
+
+    def test_matcher_is_rebuilt_after_version_bump(self):
+        product_ids = [self.products[0].id]
+        matcher = get_restaurant_matcher()
+        self.assertIs(get_restaurant_matcher(), matcher)
+        self.assertEqual(len(matcher.match(product_ids)), 3)
+
+        # Так меню меняет другой процесс: в этом процессе сигнала нет,
+        # есть только новая версия в общем кэше.
+        RestaurantMenuItem.objects.filter(product_id__in=product_ids).update(availability=False)
+        self.assertEqual(len(get_restaurant_matcher().match(product_ids)), 3)
+        bump_menu_version()
+        self.assertEqual(get_restaurant_matcher().match(product_ids), [])
+
+    def test_menu_and_restaurant_changes_bump_version(self):
+        index = get_restaurant_index()
+        version = get_menu_version()
+
+        menu_item = RestaurantMenuItem.objects.first()
+        menu_item.availability = False
+        menu_item.save()
+        self.assertNotEqual(get_menu_version(), version)
+
+        version = get_menu_version()
+        Restaurant.objects.create(name='Новый', address='Москва', latitude=55.7, longitude=37.6)
+        self.assertNotEqual(get_menu_version(), version)
+        self.assertIsNot(get_restaurant_index(), index)
+        self.assertEqual(len(get_restaurant_index().restaurants), 4)
+
+
+class RestaurantIndexTest(SimpleTestCase):
+    def setUp(self):
+        generator = random.Random(0)
+        self.restaurants = [
+            SimpleNamespace(
+                id=restaurant_id,
+                latitude=55.75 + generator.uniform(-0.3, 0.3),
+                longitude=37.6 + generator.uniform(-0.5, 0.5),
+            )
+            for restaurant_id in range(300)
+        ]
+        self.index = RestaurantIndex(self.restaurants)
+
+    def get_distances(self, lat, lon):
+        distances = haversine_matrix(
+            [(lat, lon)],
+            [(restaurant.latitude, restaurant.longitude) for restaurant in self.restaurants],
+        )[0]
+        return sorted(
+            (float(restaurant_distance), restaurant.id)
+            for restaurant, restaurant_distance in zip(self.restaurants, distances)
+        )
+
+    def assertNearest(self, lat, lon, k):
+        nearest = self.index.nearest(lat, lon, k)
+        expected = self.get_distances(lat, lon)[:k]
+        self.assertEqual([restaurant.id for restaurant, _ in nearest], [id_ for _, id_ in expected])
+
+    def test_nearest(self):
+        self.assertNearest(55.75, 37.6, 5)
+        self.assertNearest(55.9, 38.5, 10)
+
+    def test_far_point_does_not_walk_every_ring(self):
+        # Владивосток и Сидней в тысячах ячеек от ресторанов в Москве.
+        max_rings = math.isqrt(len(self.index.cells)) + 2
+        for lat, lon in [(43.1, 131.9), (-33.9, 151.2)]:
+            with self.subTest(lat=lat, lon=lon):
+                with mock.patch.object(self.index, '_get_ring', wraps=self.index._get_ring) as get_ring:
+                    self.assertNearest(lat, lon, 5)
+                self.assertLessEqual(get_ring.call_count, max_rings)
+
+                with mock.patch.object(self.index, '_get_ring', wraps=self.index._get_ring) as get_ring:
+                    within = self.index.within(lat, lon, 20000)
+                self.assertLessEqual(get_ring.call_count, max_rings)
+                self.assertEqual(len(within), len(self.restaurants))
+
+    def test_within(self):
+        within = self.index.within(55.75, 37.6, 10)
+        expected = [
+            id_ for restaurant_distance, id_ in self.get_distances(55.75, 37.6)
+            if restaurant_distance <= 10
+        ]
+        self.assertEqual([restaurant.id for restaurant, _ in within], expected)
+
+
+class AssignTest(SimpleTestCase):
+    def assertFeasible(self, costs, capacities, assignment):
+        costs = np.asarray(costs)
+        for order, restaurant in enumerate(assignment):
+            if restaurant >= 0:
+                self.assertTrue(np.isfinite(costs[order, restaurant]))
+        for restaurant, capacity in enumerate(capacities):
+            self.assertLessEqual(np.count_nonzero(assignment == restaurant), capacity)
+
+    def test_unlimited_restaurants_get_nearest_orders(self):
+        costs = np.array([[3, 1, 2], [1, 5, np.inf], [np.inf, np.inf, 4]])
+
+        assignment = assign(costs, [np.inf] * 3)
+
+        self.assertEqual(assignment.tolist(), [1, 0, 2])
+
+    def test_orders_without_suitable_restaurant_stay_unassigned(self):
+        costs = np.array([[np.inf, np.inf], [1, np.inf]])
+
+        assignment = assign(costs, [np.inf, np.inf])
+
+        self.assertEqual(assignment.tolist(), [-1, 0])
+
+    def test_swap_improves_greedy_assignment(self):
+        # Жадно первый заказ занял бы ресторан 0, и второму остался бы
+        # ресторан 1 за 10 км. Обмен сокращает путь с 11 до 3 км.
+        costs = np.array([[1, 2], [1, 10]])
+
+        assignment = assign(costs, [1, 1])
+
+        self.assertEqual(assignment.tolist(), [1, 0])
+
+    def test_capacities_are_respected(self):
+        generator = np.random.default_rng(0)
+        costs = generator.uniform(1, 20, size=(60, 8))
+        costs[generator.random(costs.shape) < 0.2] = np.inf
+        capacities = [5, 10, np.inf, 0, 3, 8, 2, 6]
+
+        assignment = assign(costs, capacities)
+
+        self.assertFeasible(costs, capacities, assignment)
+        # Ресторан без ограничений принимает всех, кому он подходит.
+        for order in np.flatnonzero(assignment < 0):
+            self.assertFalse(np.isfinite(costs[order, 2]))
+
+    def test_small_cases_are_close_to_optimal(self):
+        generator = np.random.default_rng(1)
+        for _ in range(20):
+            costs = generator.uniform(1, 20, size=(5, 3))
+            capacities = [2, 2, 1]
+
+            assignment = assign(costs, capacities)
+
+            self.assertFeasible(costs, capacities, assignment)
+            best_cost = min(
+                sum(costs[order, restaurant] for order, restaurant in enumerate(option))
+                for option in itertools.product(range(3), repeat=5)
+                if all(option.count(restaurant) <= capacities[restaurant] for restaurant in range(3))
+            )
+            self.assertLessEqual(costs[np.arange(5), assignment].sum(), best_cost * 1.2)
+
+
+@override_settings(
+    GEOCODER_BACKEND='address_and_places.geocoder.StubGeocoder',
+    GEOCODE_IN_BACKGROUND=False,
+)
+class AssignUnprocessedOrdersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generator = random.Random(0)
+        products, cls.restaurants = create_catalogue(6, 20, menu_coverage=0.7, generator=generator)
+        addresses = create_addresses(30, generator=generator)
+        cls.orders = create_orders(40, products, addresses, items_per_order=2, generator=generator)
+
+    def test_orders_get_nearest_free_suitable_restaurants(self):
+        Restaurant.objects.filter(id=self.restaurants[0].id).update(order_capacity=2)
+        busy_order = self.orders[0]
+        Order.objects.filter(id=busy_order.id).update(restaurant=self.restaurants[0])
+        bump_menu_version()
+
+        with mock.patch('foodcartapp.assignment.orders_updated.send') as send, \
+                self.captureOnCommitCallbacks(execute=True):
+            assigned_restaurants = assign_unprocessed_orders()
+
+        self.assertNotIn(busy_order.id, assigned_restaurants)
+        self.assertEqual(Order.objects.get(id=busy_order.id).restaurant_id, self.restaurants[0].id)
+        # Занятое место в ресторане учитывается.
+        self.assertEqual(Order.objects.filter(restaurant=self.restaurants[0]).count(), 2)
+        for order in Order.objects.filter(id__in=assigned_restaurants).prefetch_related('items'):
+            product_ids = {item.product_id for item in order.items.all()}
+            self.assertEqual(order.restaurant_id, assigned_restaurants[order.id].id)
+            self.assertIn(
+                order.restaurant_id,
+                Restaurant.objects.restaurants_serving_all(product_ids).values_list('id', flat=True))
+            self.assertGreater(order.updated_at, busy_order.updated_at)
+        send.assert_called_once_with(sender=Order, order_ids=list(assigned_restaurants))
+
+    def test_reassign_moves_assigned_orders(self):
+        Order.objects.update(restaurant=self.restaurants[0])
+
+        self.assertEqual(assign_unprocessed_orders(), {})
+        assigned_restaurants = assign_unprocessed_orders(reassign=True)
+
+        self.assertTrue(assigned_restaurants)
+        self.assertTrue(
+            Order.objects.exclude(restaurant=self.restaurants[0]).exists())
+
+
+@override_settings(
+    GEOCODER_BACKEND='address_and_places.geocoder.StubGeocoder',
+    GEOCODE_IN_BACKGROUND=False,
+)
+class ApiQueryCountTest(TestCase):
+    """Число запросов у каталога и приёма заказа не зависит от числа заказов."""
+    orders_count = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        generator = random.Random(0)
+        cls.products, _ = create_catalogue(10, 50, menu_coverage=1, generator=generator)
+        addresses = create_addresses(200, generator=generator)
+        create_orders(cls.orders_count, cls.products, addresses, generator=generator)
+
+    def test_product_list_api(self):
+        # Каталог собирается заново одним запросом.
+        bump_catalogue_version()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/')
+            content = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(content)
+
+    def test_register_order(self):
+        order = {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79261234567',
+            'address': 'Москва, ул. Тверская, 1',
+            'products': [
+                {'product': product.id, 'quantity': 1}
+                for product in self.products[:3]
+            ],
+        }
+        # Точка сохранения, товары, заказ, позиции одним INSERT и выход
+        # из точки сохранения.
+        with self.assertNumQueries(5):
+            response = self.client.post('/api/order/', order, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.count(), self.orders_count + 1)
+
+
+class OrderProductIdTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products, _ = create_catalogue(1, 2, menu_coverage=1, generator=random.Random(0))
+
+    def get_order(self, product_id):
+        return {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79261234567',
+            'address': 'Москва, ул. Тверская, 1',
+            'products': [{'product': product_id, 'quantity': 1}],
+        }
+
+    def test_invalid_product_ids_are_rejected(self):
+        for product_id in [10 ** 30, -(10 ** 30), 0, True, '1.5', None]:
+            with self.subTest(product_id=product_id):
+                response = self.client.post(
+                    '/api/order/', self.get_order(product_id), content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+
+                orders = [self.get_order(product_id), self.get_order(self.products[0].id)]
+                response = self.client.post(
+                    '/api/orders/bulk/', orders, content_type='application/json')
+                self.assertEqual(response.status_code, 201)
+                self.assertIn('products', response.json()[0]['errors'])
+                self.assertIn('id', response.json()[1])
+
+        self.assertEqual(Order.objects.count(), 6)
+
+
+class CreateOrdersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products, _ = create_catalogue(1, 3, menu_coverage=1, generator=random.Random(0))
+
+    def get_orders_data(self):
+        return [
+            {
+                'firstname': 'Иван',
+                'lastname': 'Петров',
+                'phonenumber': '+79261234567',
+                'address': f'Москва, ул. Тверская, {number}',
+                'products': [
+                    {'product': product, 'quantity': quantity}
+                    for quantity, product in enumerate(self.products[:number], start=1)
+                ],
+            }
+            for number in range(1, 4)
+        ]
+
+    def assertOrdersCreated(self, orders, orders_data):
+        self.assertEqual(len(orders), len(orders_data))
+        for order, order_data in zip(orders, orders_data):
+            self.assertIsNotNone(order.id)
+            order = Order.objects.get(id=order.id)
+            items = order.items.order_by('id')
+            self.assertEqual(
+                [(item.product_id, item.quantity) for item in items],
+                [(product['product'].id, product['quantity']) for product in order_data['products']],
+            )
+            for item in items:
+                self.assertEqual(item.total_product_price, item.quantity * item.product.price)
+            self.assertEqual(order.total_price, sum(item.total_product_price for item in items))
+
+    def mock_bulk_insert_support(self, supported):
+        # Подменяется только признак, который проверяет create_orders:
+        # остальные bulk_create должны работать с настоящей базой.
+        return mock.patch(
+            'foodcartapp.orders.connection',
+            features=SimpleNamespace(can_return_rows_from_bulk_insert=supported),
+        )
+
+    def test_orders_are_inserted_at_once(self):
+        orders_data = self.get_orders_data()
+        bulk_create = Order.objects.bulk_create
+
+        def bulk_create_returning_ids(orders):
+            # Django 3.2 на SQLite не возвращает id из bulk_create, поэтому
+            # здесь id дочитываются, как их вернул бы PostgreSQL.
+            bulk_create(orders)
+            order_ids = Order.objects.order_by('-id').values_list('id', flat=True)[:len(orders)]
+            for order, order_id in zip(orders, reversed(order_ids)):
+                order.id = order_id
+            return orders
+
+        orders_bulk_create = mock.patch.object(
+            Order.objects, 'bulk_create', side_effect=bulk_create_returning_ids)
+        with self.mock_bulk_insert_support(True), orders_bulk_create as orders_bulk_create, \
+                mock.patch.object(Order, 'save') as save:
+            orders = create_validated_orders(orders_data)
+
+        orders_bulk_create.assert_called_once_with(orders)
+        save.assert_not_called()
+        self.assertOrdersCreated(orders, orders_data)
+
+    def test_orders_are_saved_one_by_one_without_returning_ids(self):
+        orders_data = self.get_orders_data()
+
+        with self.mock_bulk_insert_support(False), \
+                mock.patch.object(Order.objects, 'bulk_create') as orders_bulk_create:
+            # По INSERT на заказ и один bulk_create позиций.
+            with self.assertNumQueries(3 + 1):
+                orders = create_validated_orders(orders_data)
+
+        orders_bulk_create.assert_not_called()
+        self.assertOrdersCreated(orders, orders_data)
+
+
+@override_settings(
+    GEOCODER_BACKEND='address_and_places.geocoder.StubGeocoder',
+    GEOCODE_IN_BACKGROUND=False,
+)
+class OrderTotalPriceTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generator = random.Random(0)
+        cls.products, _ = create_catalogue(1, 5, menu_coverage=1, generator=generator)
+        addresses = create_addresses(5, generator=generator)
+        cls.orders = create_orders(10, cls.products, addresses, generator=generator)
+        cls.empty_order = Order.objects.create(
+            firstname='Иван', lastname='Петров', phonenumber='+79261234567',
+            address='Москва, ул. Тверская, 1', total_price=100)
+
+    def assertTotalPricesMatchItems(self, orders):
+        for order in orders.prefetch_related('items'):
+            self.assertEqual(
+                order.total_price,
+                sum(item.total_product_price for item in order.items.all()),
+            )
+
+    def test_migration_fills_total_price(self):
+        fill_total_price = import_module(
+            'foodcartapp.migrations.0011_fill_order_total_price').fill_total_price
+        Order.objects.update(total_price=0)
+
+        fill_total_price(django_apps, None)
+
+        self.assertTotalPricesMatchItems(Order.objects.all())
+        self.assertEqual(Order.objects.get(id=self.empty_order.id).total_price, 0)
+
+    def test_admin_recalculates_total_price_after_items_change(self):
+        order = self.orders[0]
+        items = list(order.items.order_by('id'))
+        # Так позиции меняет инлайн в админке: одну правят, одну удаляют,
+        # одну добавляют.
+        items[0].quantity += 2
+        items[0].total_product_price = items[0].quantity * items[0].product.price
+        items[0].save()
+        items[1].delete()
+        order.items.create(
+            product=self.products[-1], quantity=3,
+            total_product_price=3 * self.products[-1].price)
+        self.assertNotEqual(
+            Order.objects.get(id=order.id).total_price,
+            sum(item.total_product_price for item in order.items.all()),
+        )
+
+        model_admin = admin.site._registry[Order]
+        form = SimpleNamespace(instance=order, save_m2m=lambda: None)
+        model_admin.save_related(RequestFactory().post('/'), form, [], True)
+
+        self.assertTotalPricesMatchItems(Order.objects.filter(id=order.id))
+
+
+class ProductListApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_catalogue(2, 5, menu_coverage=1, generator=random.Random(0))
+
+    def get_json(self, params):
+        response = self.client.get('/api/products/', params)
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return json.loads(content)
+
+    def test_unknown_params_return_full_catalogue(self):
+        catalogue = self.get_json({'_': '123', 'utm_source': 'newsletter'})
+        self.assertIsInstance(catalogue, list)
+        self.assertEqual(len(catalogue), Product.objects.count())
+
+    def test_form_params_return_page(self):
+        page = self.get_json({'limit': '2', 'utm_source': 'newsletter'})
+        self.assertIsInstance(page, dict)
+
+    def test_special_status_filter(self):
+        Product.objects.update(special_status=False)
+        Product.objects.filter(id=Product.objects.order_by('id').first().id).update(special_status=True)
+        bump_catalogue_version()
+
+        page = self.get_json({'special_status': 'true', 'limit': '1'})
+        self.assertEqual(len(page['results']), 1)
+        self.assertIsNone(page['next'])
+
+        page = self.get_json({'special_status': 'false', 'limit': '2'})
+        self.assertEqual(len(page['results']), 2)
+        self.assertIn('special_status=false', page['next'])
+        next_page = self.get_json(dict(parse_qsl(urlsplit(page['next']).query)))
+        self.assertTrue(next_page['results'])
+
+    def test_invalid_special_status(self):
+        for value in ['yes', 'maybe', 'True']:
+            with self.subTest(value=value):
+                response = self.client.get('/api/products/', {'special_status': value})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('special_status', json.loads(response.content))
+
+
+class ProductListEtagTest(TestCase):
+    encodings = [None, 'gzip', 'br']
+
+    @classmethod
+    def setUpTestData(cls):
+        create_catalogue(2, 5, menu_coverage=1, generator=random.Random(0))
+
+    def setUp(self):
+        bump_catalogue_version()
+        # Первый ответ собирает каталог потоком и кладёт его в кэш.
+        b''.join(self.client.get('/api/products/').streaming_content)
+
+    def get(self, encoding, etag=None):
+        headers = {}
+        if encoding:
+            headers['HTTP_ACCEPT_ENCODING'] = encoding
+        if etag:
+            headers['HTTP_IF_NONE_MATCH'] = etag
+        return self.client.get('/api/products/', **headers)
+
+    def test_each_encoding_has_own_etag(self):
+        etags = {}
+        for encoding in self.encodings:
+            response = self.get(encoding)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get('Content-Encoding'), encoding)
+            etags[encoding] = response['ETag']
+        self.assertEqual(len(set(etags.values())), len(self.encodings))
+
+        for encoding, etag in etags.items():
+            for requested_encoding in self.encodings:
+                with self.subTest(etag=etag, encoding=requested_encoding):
+                    response = self.get(requested_encoding, etag)
+                    expected_status = 304 if requested_encoding == encoding else 200
+                    self.assertEqual(response.status_code, expected_status)
+
+    def test_streamed_catalogue_has_identity_etag(self):
+        identity_etag = self.get(None)['ETag']
+        bump_catalogue_version()
+
+        response = self.get('gzip')
+
+        self.assertTrue(response.streaming)
+        self.assertNotEqual(response['ETag'], identity_etag)
+        self.assertEqual(self.get(None, response['ETag']).status_code, 304)
+
+
+class AsyncProductListApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_catalogue(2, 5, menu_coverage=1, generator=random.Random(0))
+
+    def setUp(self):
+        bump_catalogue_version()
+        self.factory = AsyncRequestFactory()
+
+    def get(self, encoding=None, etag=None, params=None):
+        # AsyncRequestFactory в Django 3.2 передаёт заголовки как есть, а
+        # параметры берёт только из пути.
+        headers = {}
+        if encoding:
+            headers['accept-encoding'] = encoding
+        if etag:
+            headers['if-none-match'] = etag
+        path = f'/api/products/?{urlencode(params or {})}'
+        return async_product_list_api(self.factory.get(path, **headers))
+
+    async def test_etags_match_sync_view(self):
+        for encoding in [None, 'gzip', 'br']:
+            with self.subTest(encoding=encoding):
+                response = await self.get(encoding)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.get('Content-Encoding'), encoding)
+                headers = {'HTTP_ACCEPT_ENCODING': encoding} if encoding else {}
+                sync_response = await sync_to_async(self.client.get)('/api/products/', **headers)
+                self.assertEqual(response['ETag'], sync_response['ETag'])
+
+                response = await self.get(encoding, response['ETag'])
+                self.assertEqual(response.status_code, 304)
+
+    async def test_cache_is_not_used_in_event_loop(self):
+        cache_get = cache.get
+
+        def get_outside_event_loop(*args, **kwargs):
+            with self.assertRaises(RuntimeError):
+                asyncio.get_running_loop()
+            return cache_get(*args, **kwargs)
+
+        with mock.patch.object(cache, 'get', side_effect=get_outside_event_loop) as patched_get:
+            response = await self.get('gzip')
+            self.assertEqual(response.status_code, 200)
+            response = await self.get(params={'limit': '2'})
+            self.assertEqual(len(json.loads(response.content)['results']), 2)
+            response = await self.get(params={'special_status': 'maybe'})
+            self.assertEqual(response.status_code, 400)
+
+        self.assertTrue(patched_get.called)
+
+
+class ApiQueryCount1000Test(ApiQueryCountTest):
+    orders_count = 1000
+
+
+class ApiQueryCount10000Test(ApiQueryCountTest):
+    orders_count = 10000
+
+
+class BannersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Миграции создают баннеры для витрины.
+        Banner.objects.all().delete()
+
+    def get_titles(self):
+        return [banner['title'] for banner in json.loads(get_rendered_banners())]
+
+    def test_banners_are_rendered_again_after_version_bump(self):
+        banner = Banner.objects.create(title='Скидка', image='banner.jpg')
+        self.assertEqual(self.get_titles(), ['Скидка'])
+
+        # Так баннер меняет другой процесс: в этом процессе сигнала нет,
+        # есть только новая версия в общем кэше.
+        Banner.objects.filter(id=banner.id).update(title='Новинка')
+        self.assertEqual(self.get_titles(), ['Скидка'])
+        bump_banners_version()
+        self.assertEqual(self.get_titles(), ['Новинка'])
+
+    def test_banner_save_bumps_version(self):
+        banner = Banner.objects.create(title='Скидка', image='banner.jpg')
+        self.assertEqual(self.get_titles(), ['Скидка'])
+
+        banner.is_active = False
+        banner.save()
+
+        self.assertEqual(self.get_titles(), [])
+
+
+@override_settings(
+    GEOCODER_BACKEND='address_and_places.geocoder.StubGeocoder',
+    GEOCODE_IN_BACKGROUND=False,
+)
+class ExplainHotQueriesTest(TestCase):
+    def explain(self, **options):
+        stdout = io.StringIO()
+        call_command('explain_hot_queries', stdout=stdout, stderr=io.StringIO(), **options)
+        return stdout.getvalue()
+
+    def test_hot_queries_use_indexes(self):
+        output = self.explain(orders=2000, fail=True)
+
+        self.assertIn('Заказов: 2000', output)
+        self.assertIn('Все запросы используют индексы', output)
+        for index in ['order_unprocessed_idx', 'order_status_registrated_idx', 'orderitem_order_product_idx']:
+            self.assertIn(index, output)
+        # Тестовые заказы создаются в транзакции, которая откатывается.
+        self.assertFalse(Order.objects.exists())
+
+    def test_full_scan_fails(self):
+        hot_queries = {'поиск по имени': Order.objects.filter(firstname='Иван')}
+
+        with mock.patch(
+                'foodcartapp.management.commands.explain_hot_queries.get_hot_queries',
+                return_value=hot_queries):
+            with self.assertRaisesMessage(CommandError, 'поиск по имени: '):
+                self.explain(fail=True)
+            self.assertNotIn('Все запросы используют индексы', self.explain())
+
+
+class CopyBannerImagesTest(TestCase):
+    def test_missing_images_are_copied_once(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            call_command('copy_banner_images', stdout=io.StringIO())
+            self.assertEqual(sorted(os.listdir(media_root)), ['burger.jpg', 'food.jpg', 'tasty.jpg'])
+
+            stdout = io.StringIO()
+            call_command('copy_banner_images', stdout=stdout)
+            self.assertEqual(len(os.listdir(media_root)), 3)
+            self.assertIn('Скопировано картинок: 0', stdout.getvalue())
+
+
+@override_settings(
+    GEOCODER_BACKEND='address_and_places.geocoder.StubGeocoder',
+    GEOCODE_IN_BACKGROUND=False,
+)
+class LoadCatalogueTest(TestCase):
+    products = [
+        {'title': 'Чизбургер', 'type': 'Бургеры', 'price': 199, 'img': 'burger.jpg', 'description': ''},
+        {'title': 'Гамбургер', 'type': 'Бургеры', 'price': 149.5, 'img': 'burger.jpg'},
+        {'title': 'Кола', 'type': 'Напитки', 'price': 99, 'img': 'нет.jpg'},
+    ]
+    restaurants = [
+        {'title': 'Star Burger Арбат', 'address': 'Москва, Арбат, 1', 'contact_phone': '+74951234567',
+         'latitude': 55.75, 'longitude': 37.59, 'menu': ['Чизбургер']},
+        {'title': 'Star Burger Тверская', 'address': 'Москва, Тверская, 1',
+         'latitude': 55.76, 'longitude': 37.61},
+    ]
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.data_dir = temp_dir.name
+        media_root = os.path.join(self.data_dir, 'media')
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.images_dir = os.path.join(self.data_dir, 'images')
+        os.mkdir(self.images_dir)
+        with open(os.path.join(self.images_dir, 'burger.jpg'), 'wb') as image:
+            image.write(b'burger')
+
+    def load(self, products, restaurants):
+        paths = {}
+        for name, data in [('products', products), ('restaurants', restaurants)]:
+            paths[name] = os.path.join(self.data_dir, f'{name}.json')
+            with open(paths[name], 'w', encoding='utf-8') as file:
+                json.dump(data, file, ensure_ascii=False)
+        stdout = io.StringIO()
+        call_command(
+            'load_catalogue', images_dir=self.images_dir, full_menu=True,
+            batch_size=2, stdout=stdout, **paths)
+        return dict(
+            line.split(': ') for line in stdout.getvalue().splitlines() if ': ' in line)
+
+    def get_catalogue(self):
+        return (
+            sorted(Product.objects.values_list('name', 'category__name', 'price', 'image')),
+            sorted(Restaurant.objects.values_list('name', 'address', 'latitude', 'longitude')),
+            RestaurantMenuItem.objects.count(),
+        )
+
+    def test_loading_same_files_again_changes_nothing(self):
+        stats = self.load(self.products, self.restaurants)
+        self.assertEqual(stats['products_created'], '3')
+        self.assertEqual(stats['restaurants_created'], '2')
+        self.assertEqual(stats['images_copied'], '1')
+        self.assertEqual(stats['images_missing'], '1')
+        catalogue = self.get_catalogue()
+        self.assertEqual(catalogue[2], 6)
+        # Одна картинка у двух товаров хранится один раз.
+        self.assertEqual(os.listdir(os.path.join(settings.MEDIA_ROOT, 'products')), [
+            os.path.basename(Product.objects.get(name='Чизбургер').image.name)])
+
+        stats = self.load(self.products, self.restaurants)
+
+        self.assertEqual(self.get_catalogue(), catalogue)
+        for name in ['products_created', 'products_updated', 'categories_created',
+                     'restaurants_created', 'restaurants_updated', 'menu_items']:
+            self.assertEqual(stats.get(name, '0'), '0', name)
+        self.assertNotIn('images_copied', stats)
+
+    def test_changed_entries_are_updated(self):
+        self.load(self.products, self.restaurants)
+        products = [dict(self.products[0], price=249), *self.products[1:]]
+        restaurants = [dict(self.restaurants[0], address='Москва, Арбат, 2'), self.restaurants[1]]
+
+        stats = self.load(products, restaurants)
+
+        self.assertEqual(stats['products_updated'], '1')
+        self.assertEqual(stats['restaurants_updated'], '1')
+        self.assertEqual(Product.objects.get(name='Чизбургер').price, 249)
+        self.assertEqual(Restaurant.objects.get(name='Star Burger Арбат').address, 'Москва, Арбат, 2')
+        self.assertEqual(Product.objects.count(), 3)
+
+    def test_json_array_is_read_across_chunks(self):
+        items = [{'title': 'Товар', 'price': 12345678}, 1.5, 'строка, с ] скобкой', [], 10]
+        file = io.StringIO(json.dumps(items, ensure_ascii=False))
+        self.assertEqual(list(iter_json_array_file(file, chunk_size=3)), items)
+
+
+@override_settings(
+    GEOCODER_BACKEND='address_and_places.geocoder.StubGeocoder',
+    GEOCODE_IN_BACKGROUND=False,
+)
+class ArchiveTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generator = random.Random(0)
+        products, _ = create_catalogue(3, 10, menu_coverage=1, generator=generator)
+        addresses = create_addresses(10, generator=generator)
+        cls.orders = create_orders(
+            20, products, addresses, processed_share=1, generator=generator)
+
+    def test_archived_items_outlive_products(self):
+        sales = get_monthly_sales()
+        archive_orders(timezone.now() + timedelta(days=1), 0, self.orders[-1].id)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(get_monthly_sales(), sales)
+
+        Product.objects.all().delete()
+
+        self.assertFalse(ArchivedOrderItem.objects.filter(product__isnull=False).exists())
+        self.assertEqual(ArchivedOrderItem.objects.count(), 60)
+        self.assertEqual(get_monthly_sales(), sales)
+
+    def get_rows(self, model, **filters):
+        fields = [
+            field.attname for field in model._meta.concrete_fields
+            if field.attname != 'archived_at'
+        ]
+        return list(model.objects.filter(**filters).order_by('id').values_list(*fields))
+
+    def test_only_old_processed_orders_in_range_are_moved(self):
+        order_ids = [order.id for order in self.orders]
+        Order.objects.filter(id__in=order_ids[:3]).update(status='UNPR')
+        Order.objects.filter(id__in=order_ids[3:6]).update(
+            registrated_at=timezone.now() + timedelta(days=2))
+        moved_ids = order_ids[6:15]
+        orders = self.get_rows(Order, id__in=moved_ids)
+        items = self.get_rows(OrderItem, order_id__in=moved_ids)
+
+        orders_count, items_count = archive_orders(
+            timezone.now() + timedelta(days=1), order_ids[0], order_ids[14])
+
+        self.assertEqual((orders_count, items_count), (9, 27))
+        self.assertEqual(self.get_rows(ArchivedOrder), orders)
+        self.assertEqual(self.get_rows(ArchivedOrderItem), items)
+        self.assertFalse(Order.objects.filter(id__in=moved_ids).exists())
+        self.assertFalse(OrderItem.objects.filter(order_id__in=moved_ids).exists())
+        self.assertEqual(Order.objects.count(), 11)
+
+        # Повторный перенос того же диапазона ничего не делает.
+        self.assertEqual(
+            archive_orders(timezone.now() + timedelta(days=1), order_ids[0], order_ids[14]), (0, 0))
+
+    def test_command_moves_orders_in_batches(self):
+        first_id = self.orders[0].id
+        stdout = io.StringIO()
+
+        call_command('archive_orders', days=0, dry_run=True, stdout=stdout)
+        self.assertIn('Будет перенесено заказов: 20', stdout.getvalue())
+        self.assertEqual(Order.objects.count(), 20)
+
+        call_command('archive_orders', days=0, batch_size=5, max_batches=2, stdout=stdout)
+        self.assertEqual(ArchivedOrder.objects.count(), 10)
+        self.assertIn(f'Продолжить можно с --start-id {first_id + 10}', stdout.getvalue())
+
+        call_command('archive_orders', days=0, batch_size=5, start_id=first_id + 10, stdout=stdout)
+        self.assertEqual(ArchivedOrder.objects.count(), 20)
+        self.assertFalse(Order.objects.exists())
+
+
+class ScalableAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generator = random.Random(0)
+        products, _ = create_catalogue(3, 10, menu_coverage=1, generator=generator)
+        addresses = create_addresses(10, generator=generator)
+        cls.orders = create_orders(20, products, addresses, generator=generator)
+        cls.admin_user = get_user_model().objects.create_superuser('admin', password='admin')
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def test_small_table_with_id_gaps_is_counted(self):
+        # Остались первый и последний заказ: оценка по диапазону id дала бы 20.
+        Order.objects.exclude(id__in=[self.orders[0].id, self.orders[-1].id]).delete()
+        queryset = Order.objects.order_by('id')
+
+        paginator = EstimatedCountPaginator(queryset, 5)
+        self.assertEqual(paginator.count, 2)
+        self.assertFalse(paginator.is_estimated_count)
+        self.assertEqual(paginator.num_pages, 1)
+
+        with mock.patch('foodcartapp.changelists.COUNT_LIMIT', 1):
+            paginator = EstimatedCountPaginator(queryset, 5)
+            self.assertEqual(paginator.count, 20)
+            self.assertTrue(paginator.is_estimated_count)
+
+    def test_filtered_list_is_counted_up_to_limit(self):
+        queryset = Order.objects.filter(id__in=[order.id for order in self.orders[:12]]).order_by('id')
+
+        paginator = EstimatedCountPaginator(queryset, 5)
+        self.assertEqual(paginator.count, 12)
+        self.assertFalse(paginator.is_capped_count)
+
+        with mock.patch('foodcartapp.changelists.COUNT_LIMIT', 10):
+            paginator = EstimatedCountPaginator(queryset, 5)
+            self.assertEqual(paginator.count, 10)
+            self.assertTrue(paginator.is_capped_count)
+            self.assertFalse(paginator.is_estimated_count)
+
+    def test_keyset_pages_cover_list_once(self):
+        expected_ids = list(Order.objects.order_by('-registrated_at', '-id').values_list('id', flat=True))
+        url = '/admin/foodcartapp/order/'
+        order_ids = []
+        with mock.patch.object(admin.site._registry[Order], 'list_per_page', 7):
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                changelist = response.context['cl']
+                self.assertEqual(changelist.result_count, 20)
+                order_ids += [order.id for order in changelist.result_list]
+                url = changelist.next_page_url and f'/admin/foodcartapp/order/{changelist.next_page_url}'
+
+        self.assertEqual(order_ids, expected_ids)
+        self.assertContains(response, '« В начало')
+        self.assertNotContains(response, 'Дальше »')
+
+    def test_broken_cursor_shows_first_page(self):
+        with mock.patch.object(admin.site._registry[Order], 'list_per_page', 7):
+            response = self.client.get('/admin/foodcartapp/order/', {'after': 'не курсор'})
+
+        changelist = response.context['cl']
+        self.assertIsNone(changelist.cursor)
+        self.assertEqual(len(changelist.result_list), 7)
+
+    def test_date_range_hierarchy(self):
+        order_ids = [order.id for order in self.orders]
+        Order.objects.filter(id=order_ids[0]).update(
+            registrated_at=timezone.make_aware(datetime(2023, 11, 5)))
+        Order.objects.filter(id__in=order_ids[1:10]).update(
+            registrated_at=timezone.make_aware(datetime(2024, 2, 10)))
+        Order.objects.filter(id__in=order_ids[10:]).update(
+            registrated_at=timezone.make_aware(datetime(2024, 4, 1)))
+
+        response = self.client.get('/admin/foodcartapp/order/')
+        self.assertEqual([choice['title'] for choice in response.context['choices']], ['2023', '2024'])
+
+        # Месяцы берутся из календаря между первой и последней датой,
+        # поэтому март без заказов тоже попадает в навигацию.
+        response = self.client.get('/admin/foodcartapp/order/', {'registrated_at__year': '2024'})
+        self.assertEqual(response.context['cl'].result_count, 19)
+        self.assertEqual(
+            [choice['link'] for choice in response.context['choices']],
+            [f'?registrated_at__month={month}&registrated_at__year=2024' for month in [2, 3, 4]])
+
+        response = self.client.get(
+            '/admin/foodcartapp/order/', {'registrated_at__year': '2024', 'registrated_at__month': '4'})
+        self.assertEqual(response.context['cl'].result_count, 10)
+        self.assertEqual(len(response.context['choices']), 1)
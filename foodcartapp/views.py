@@ -1,79 +1,164 @@
-from django.http import JsonResponse
-from django.templatetags.static import static
-from .models import Product, Order, OrderItem, Restaurant, RestaurantMenuItem
+import calendar
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from .serializers import OrderItemSerializer, OrderSerializer
+from .serializers import OrderSerializer, load_products_of_orders
+from .catalogue import get_catalogue_etag, get_catalogue_last_modified, get_catalogue_version
+from .catalogue import get_catalogue_page, get_rendered_catalogue
+from .catalogue import render_catalogue, stream_catalogue
+from .forms import ProductListForm
+from .renderers import dumps, get_accepted_encoding
+from .banners import get_banners_version, get_cached_banners, get_rendered_banners
+from .orders import create_orders
 from rest_framework import status
+from django.conf import settings
 from django.db import transaction
+from address_and_places.tasks import enqueue_geocoding
 
 
 def banners_list_api(request):
-    # FIXME move data to db?
-    return JsonResponse([
-        {
-            'title': 'Burger',
-            'src': static('burger.jpg'),
-            'text': 'Tasty Burger at your door step',
-        },
-        {
-            'title': 'Spices',
-            'src': static('food.jpg'),
-            'text': 'All Cuisines',
-        },
-        {
-            'title': 'New York',
-            'src': static('tasty.jpg'),
-            'text': 'Food is incomplete without a tasty dessert',
-        }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    return HttpResponse(get_rendered_banners(), content_type='application/json')
+
+
+async def async_banners_list_api(request):
+    # Версия баннеров лежит в синхронном кэше, а готовый JSON — в памяти процесса.
+    version = await sync_to_async(get_banners_version)()
+    rendered_banners = get_cached_banners(version)
+    if rendered_banners is None:
+        rendered_banners = await sync_to_async(get_rendered_banners)()
+    return HttpResponse(rendered_banners, content_type='application/json')
+
+
+def make_catalogue_response(rendered_catalogue, encoding):
+    response = HttpResponse(rendered_catalogue, content_type='application/json')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def make_bad_request_response(form):
+    return HttpResponseBadRequest(dumps(form.errors), content_type='application/json')
+
+
+def get_catalogue_encoding(request):
+    # Страницы каталога отдаются без сжатия, сжимается только каталог целиком.
+    if ProductListForm.has_params(request.GET):
+        return None
+    return get_accepted_encoding(request)
+
+
+def get_product_list_etag(request):
+    version = get_catalogue_version()['version']
+    return get_catalogue_etag(version, get_catalogue_encoding(request))
+
+
+def get_product_list_validators(request):
+    """ETag и время изменения каталога, которые проверяет @condition у product_list_api."""
+    return get_product_list_etag(request), get_catalogue_last_modified(request)
+
 
+def make_product_list_response(request, stream=True):
+    version = get_catalogue_version()['version']
+    if ProductListForm.has_params(request.GET):
+        form = ProductListForm(request.GET)
+        if not form.is_valid():
+            return make_bad_request_response(form)
+        rendered_page = get_catalogue_page(version, request.path, form.cleaned_data)
+        return HttpResponse(rendered_page, content_type='application/json')
 
+    encoding = get_catalogue_encoding(request)
+    rendered_catalogue = get_rendered_catalogue(version, encoding)
+    if rendered_catalogue is None and not stream:
+        render_catalogue(version)
+        rendered_catalogue = get_rendered_catalogue(version, encoding)
+    if rendered_catalogue is None:
+        # Пока каталога нет в кэше, он отдаётся без сжатия, и ETag у него
+        # тоже от несжатого тела.
+        response = StreamingHttpResponse(
+            stream_catalogue(version), content_type='application/json')
+        response['ETag'] = quote_etag(get_catalogue_etag(version))
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+    return make_catalogue_response(rendered_catalogue, encoding)
+
+
+@condition(etag_func=get_product_list_etag, last_modified_func=get_catalogue_last_modified)
 def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            },
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    return make_product_list_response(request)
+
+
+async def async_product_list_api(request):
+    # Кэш в Django 3.2 только синхронный, поэтому к нему, как и к базе,
+    # обращаются в потоке. В цикле событий остаётся проверка условного запроса.
+    etag, last_modified = await sync_to_async(get_product_list_validators)(request)
+    etag = quote_etag(etag)
+    last_modified = calendar.timegm(last_modified.utctimetuple())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    # Потоковый ответ Django 3.2 под ASGI читал бы из базы прямо в цикле
+    # событий, поэтому каталог собирается целиком.
+    response = await sync_to_async(make_product_list_response)(request, stream=False)
+    response.setdefault('ETag', etag)
+    response.setdefault('Last-Modified', http_date(last_modified))
+    return response
 
 
 @api_view(['POST'])
 @transaction.atomic
 def register_order(request):
-    order_serializer = OrderSerializer(data=request.data)
+    products = load_products_of_orders([request.data])
+    order_serializer = OrderSerializer(data=request.data, context={"products": products})
     order_serializer.is_valid(raise_exception=True)
     validated_data = order_serializer.validated_data
-    order = Order.objects.create(firstname=validated_data["firstname"], lastname=validated_data["lastname"],
-                                 phonenumber=validated_data["phonenumber"], address=validated_data["address"])
-
-    products = validated_data['products']
-    order_items = [
-        OrderItem(
-            order=order, total_product_price=product['quantity'] * product['product'].price, **product)
-        for product in products
-    ]
-    OrderItem.objects.bulk_create(order_items)
+    order, = create_orders([validated_data])
+    transaction.on_commit(lambda: enqueue_geocoding(order.address))
     serialized_order = OrderSerializer(order)
     return Response(serialized_order.data, status=status.HTTP_201_CREATED)
+
+
+def enqueue_geocoding_of_addresses(addresses):
+    for address in addresses:
+        enqueue_geocoding(address)
+
+
+@api_view(['POST'])
+def register_orders_bulk(request):
+    orders_data = request.data
+    if not isinstance(orders_data, list) or not orders_data:
+        return Response({"error": "Ожидается непустой список заказов"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if len(orders_data) > settings.BULK_ORDERS_MAX_SIZE:
+        return Response({"error": f"Не больше {settings.BULK_ORDERS_MAX_SIZE} заказов за раз"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    products = load_products_of_orders(orders_data)
+    results = []
+    valid_orders = []
+    for order_data in orders_data:
+        order_serializer = OrderSerializer(data=order_data, context={"products": products})
+        if order_serializer.is_valid():
+            valid_orders.append(order_serializer.validated_data)
+            results.append(None)
+        else:
+            results.append({"errors": order_serializer.errors})
+    if not valid_orders:
+        return Response(results, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        orders = create_orders(valid_orders)
+        addresses = {order.address for order in orders}
+        transaction.on_commit(lambda: enqueue_geocoding_of_addresses(addresses))
+
+    created_orders = iter(orders)
+    for position, result in enumerate(results):
+        if result is None:
+            results[position] = OrderSerializer(next(created_orders)).data
+    return Response(results, status=status.HTTP_201_CREATED)
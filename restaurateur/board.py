@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from address_and_places.distances import get_point, rank_restaurants
+from address_and_places.geocoder import bulk_geocode
+from foodcartapp.matching import get_restaurant_matcher
+from foodcartapp.spatial import get_restaurant_index
+
+
+def serialize_order(order, ranked_restaurants):
+    restaurants = [
+        {"suitable_restaurant": restaurant,
+         "distance_to_suitable_restaurant": distance_to_restaurant}
+        for restaurant, distance_to_restaurant in ranked_restaurants
+    ]
+    price_of_order = str(order.total_price)
+
+    serialized_order = {"id": order.id, "firstname": order.firstname, "lastname": order.lastname, "phonenumber": order.phonenumber, "address": order.address,
+                 "price_of_order": price_of_order,
+                 "status": order.get_status_display(), "payment_method": order.get_payment_method_display(), "comment": order.comment, "restaurants": restaurants,
+                 "assigned_restaurant": order.restaurant}
+    
+    return serialized_order
+
+
+def serialize_orders(orders):
+    """Готовит строки доски заказов.
+
+    Позиции заказов должны быть загружены через prefetch_related: подходящие
+    рестораны всех заказов подбираются одним проходом по битовым маскам,
+    без запросов к базе.
+    """
+    addresses_geodata = bulk_geocode({order.address for order in orders})
+    products_of_orders = {
+        order.id: {item.product_id for item in order.items.all()}
+        for order in orders
+    }
+    suitable_restaurants_for_orders = get_restaurant_matcher().match_orders(products_of_orders)
+    restaurant_index = get_restaurant_index()
+    limit = settings.ORDER_RESTAURANTS_LIMIT
+
+    points_of_orders = {}
+    candidates_of_orders = {}
+    for order in orders:
+        point = get_point(addresses_geodata.get(order.address))
+        suitable_restaurants = suitable_restaurants_for_orders[order.id]
+        points_of_orders[order.id] = point
+        if not point:
+            candidates_of_orders[order.id] = []
+        elif len(suitable_restaurants) <= limit:
+            candidates_of_orders[order.id] = suitable_restaurants
+        else:
+            # Из многих подходящих ресторанов ближайших отбирает индекс.
+            candidates_of_orders[order.id] = [
+                restaurant for restaurant, _ in restaurant_index.nearest(
+                    *point, limit, product_ids=products_of_orders[order.id])
+            ]
+    # Кандидатов всех заказов упорядочивает одна матрица расстояний.
+    ranked_restaurants_for_orders = rank_restaurants(
+        points_of_orders, candidates_of_orders,
+        refine_top=settings.DISTANCE_GEODESIC_REFINE_TOP)
+    return [
+        serialize_order(order, ranked_restaurants_for_orders[order.id])
+        for order in orders
+    ]
+
+
+def get_board_changes(changed_orders, removed_order_ids=()):
+    """Готовит изменения доски заказов: новые строки таблицы и id убранных заказов.
+
+    `removed_order_ids` — id удалённых заказов, которых уже нет в базе.
+    """
+    unprocessed_orders = [order for order in changed_orders if order.status == "UNPR"]
+    rows = [
+        {
+            "id": serialized_order["id"],
+            "html": render_to_string(
+                "order_row.html", {"serialized_order": serialized_order}),
+        }
+        for serialized_order in serialize_orders(unprocessed_orders)
+    ]
+    return {
+        "rows": rows,
+        "removed": [
+            *(order.id for order in changed_orders if order.status != "UNPR"),
+            *removed_order_ids,
+        ],
+    }
@@ -0,0 +1,88 @@
+import json
+import logging
+import queue
+import threading
+
+from django.db import connections
+
+from foodcartapp.models import Order
+
+from .board import get_board_changes
+
+
+logger = logging.getLogger(__name__)
+
+
+class OrderEventHub:
+    """Рассылает изменения заказов всем открытым вкладкам менеджеров.
+
+    Id изменённых заказов копятся в множестве. Один рабочий поток на процесс
+    загружает и отрисовывает их один раз и раскладывает готовое событие по
+    очередям подписчиков, так что число вкладок не умножает запросы к базе.
+    """
+
+    def __init__(self, subscriber_queue_size=100):
+        self.subscriber_queue_size = subscriber_queue_size
+        self._subscribers = set()
+        self._pending_ids = set()
+        self._lock = threading.Lock()
+        self._has_pending = threading.Event()
+        self._worker = None
+
+    def subscribe(self):
+        events = queue.Queue(maxsize=self.subscriber_queue_size)
+        with self._lock:
+            self._subscribers.add(events)
+        return events
+
+    def unsubscribe(self, events):
+        with self._lock:
+            self._subscribers.discard(events)
+
+    def publish(self, order_ids):
+        with self._lock:
+            if not self._subscribers:
+                return
+            self._pending_ids.update(order_ids)
+            if not self._worker or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="order-events", daemon=True)
+                self._worker.start()
+        self._has_pending.set()
+
+    def _take_pending_ids(self):
+        with self._lock:
+            order_ids = self._pending_ids
+            self._pending_ids = set()
+            self._has_pending.clear()
+            subscribers = list(self._subscribers)
+        return order_ids, subscribers
+
+    def _run(self):
+        while True:
+            self._has_pending.wait()
+            order_ids, subscribers = self._take_pending_ids()
+            if not order_ids or not subscribers:
+                continue
+            try:
+                changed_orders = list(
+                    Order.objects.filter(id__in=order_ids)
+                    .select_related("restaurant").prefetch_related("items"))
+                # Заказов, которых не нашлось, уже нет в базе.
+                removed_order_ids = order_ids - {order.id for order in changed_orders}
+                event = json.dumps(
+                    get_board_changes(changed_orders, sorted(removed_order_ids)),
+                    ensure_ascii=False)
+            except Exception:
+                logger.exception("Не удалось подготовить событие для заказов %s", order_ids)
+                continue
+            finally:
+                connections.close_all()
+            for events in subscribers:
+                try:
+                    events.put_nowait(event)
+                except queue.Full:
+                    logger.warning("Вкладка менеджера не успевает читать события")
+
+
+order_events = OrderEventHub()
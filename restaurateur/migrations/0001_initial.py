@@ -0,0 +1,26 @@
+# Generated by Django 3.2 on 2026-10-18 21:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RemovedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.IntegerField(verbose_name='id заказа')),
+                ('removed_at', models.DateTimeField(db_index=True, verbose_name='удалён')),
+            ],
+            options={
+                'verbose_name': 'удалённый заказ',
+                'verbose_name_plural': 'удалённые заказы',
+            },
+        ),
+    ]
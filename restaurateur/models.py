@@ -1,3 +1,33 @@
+from datetime import timedelta
+
 from django.db import models
+from django.utils import timezone
+
+
+# Открытая страница заказов узнаёт об удалениях при следующем опросе,
+# а закрытая при открытии загружает заказы заново, поэтому отметки
+# старше суток уже никому не нужны.
+REMOVED_ORDERS_TTL = timedelta(days=1)
+
+
+class RemovedOrderQuerySet(models.QuerySet):
+    def record(self, order_ids):
+        """Отмечает заказы удалёнными и заодно стирает устаревшие отметки."""
+        removed_at = timezone.now()
+        self.filter(removed_at__lt=removed_at - REMOVED_ORDERS_TTL).delete()
+        self.bulk_create([
+            RemovedOrder(order_id=order_id, removed_at=removed_at)
+            for order_id in order_ids
+        ])
+
+
+class RemovedOrder(models.Model):
+    """Отметка об удалённом заказе, чтобы убрать его с открытых страниц заказов."""
+    order_id = models.IntegerField('id заказа')
+    removed_at = models.DateTimeField('удалён', db_index=True)
+
+    objects = RemovedOrderQuerySet.as_manager()
 
-# Create your models here.
+    class Meta:
+        verbose_name = 'удалённый заказ'
+        verbose_name_plural = 'удалённые заказы'
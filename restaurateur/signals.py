@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from foodcartapp.models import Order
+from foodcartapp.signals import orders_created, orders_deleted, orders_updated
+
+from .events import order_events
+from .models import RemovedOrder
+
+
+@receiver(orders_created)
+def publish_created_orders(sender, orders, **kwargs):
+    order_events.publish([order.id for order in orders])
+
+
+@receiver(post_save, sender=Order)
+def publish_changed_order(sender, instance, **kwargs):
+    transaction.on_commit(lambda: order_events.publish([instance.id]))
+
+
+@receiver(orders_updated)
+def publish_updated_orders(sender, order_ids, **kwargs):
+    order_events.publish(order_ids)
+
+
+@receiver(post_delete, sender=Order)
+def publish_deleted_order(sender, instance, **kwargs):
+    publish_deleted_orders(sender, [instance.id])
+
+
+@receiver(orders_deleted)
+def publish_deleted_orders(sender, order_ids, **kwargs):
+    # Отметка пишется в той же транзакции, что и удаление, и откатится вместе с ним.
+    RemovedOrder.objects.record(order_ids)
+    transaction.on_commit(lambda: order_events.publish(order_ids))
@@ -1,3 +1,261 @@
-from django.test import TestCase
+import json
+import random
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from foodcartapp.archive import archive_orders
+from foodcartapp.models import Order, Product, Restaurant, RestaurantMenuItem
+from foodcartapp.synthetic import create_addresses, create_catalogue, create_orders
+
+from .events import OrderEventHub
+from .models import REMOVED_ORDERS_TTL, RemovedOrder
+
+
+@override_settings(
+    ORDER_BOARD_CHANGES_LIMIT=50,
+    GEOCODER_BACKEND='address_and_places.geocoder.StubGeocoder',
+    GEOCODE_IN_BACKGROUND=False,
+)
+class OrderChangesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generator = random.Random(0)
+        products, _ = create_catalogue(3, 10, menu_coverage=1, generator=generator)
+        addresses = create_addresses(10, generator=generator)
+        cls.orders = create_orders(120, products, addresses, generator=generator)
+        cls.manager = get_user_model().objects.create(username='manager', is_staff=True)
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def get_changes(self, cursor):
+        response = self.client.get('/manager/orders/changes/', {'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_orders_with_same_updated_at_are_not_repeated(self):
+        # Так updated_at ставят bulk_update и распределение по ресторанам.
+        updated_at = timezone.now()
+        Order.objects.update(updated_at=updated_at)
+        cursor = (updated_at - timezone.timedelta(seconds=1)).isoformat()
+
+        received_ids = []
+        for _ in range(5):
+            changes = self.get_changes(cursor)
+            received_ids += [row['id'] for row in changes['rows']]
+            self.assertNotEqual(changes['cursor'], cursor)
+            cursor = changes['cursor']
+            if len(changes['rows']) < 50:
+                break
+
+        self.assertEqual(len(received_ids), len(set(received_ids)))
+        self.assertEqual(sorted(received_ids), sorted(order.id for order in self.orders))
+
+    def test_cursor_without_id_includes_overlap(self):
+        updated_at = timezone.now()
+        Order.objects.filter(id=self.orders[0].id).update(updated_at=updated_at)
+        Order.objects.exclude(id=self.orders[0].id).update(
+            updated_at=updated_at - timezone.timedelta(days=1))
+
+        changes = self.get_changes((updated_at + timezone.timedelta(seconds=1)).isoformat())
+
+        self.assertEqual([row['id'] for row in changes['rows']], [self.orders[0].id])
+        self.assertNotIn('|', changes['cursor'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/manager/orders/changes/', {'cursor': 'вчера'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_deleted_orders_are_removed(self):
+        cursor = timezone.now().isoformat()
+        deleted_order, archived_order = self.orders[:2]
+        removed_ids = [deleted_order.id, archived_order.id]
+        Order.objects.filter(id=archived_order.id).update(status='PR')
+
+        deleted_order.delete()
+        archive_orders(timezone.now() + timezone.timedelta(days=1), archived_order.id, archived_order.id)
+
+        changes = self.get_changes(cursor)
+        self.assertCountEqual(changes['removed'], removed_ids)
+        # Удаление видно, пока курсор его не перешагнёт.
+        changes = self.get_changes(changes['cursor'])
+        self.assertCountEqual(changes['removed'], removed_ids)
+
+        changes = self.get_changes((timezone.now() + timezone.timedelta(minutes=1)).isoformat())
+        self.assertEqual(changes['removed'], [])
+
+    def test_removal_is_rolled_back_with_delete(self):
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            self.orders[0].delete()
+            1 / 0
+
+        self.assertFalse(RemovedOrder.objects.exists())
+
+    def test_old_removals_are_forgotten(self):
+        RemovedOrder.objects.create(
+            order_id=0, removed_at=timezone.now() - REMOVED_ORDERS_TTL - timezone.timedelta(minutes=1))
+
+        order_id = self.orders[0].id
+        self.orders[0].delete()
+
+        self.assertEqual(list(RemovedOrder.objects.values_list('order_id', flat=True)), [order_id])
+
+
+class OrderEventHubTest(SimpleTestCase):
+    def test_missing_orders_are_published_as_removed(self):
+        hub = OrderEventHub()
+        events = hub.subscribe()
+
+        with mock.patch.object(Order.objects, 'filter', return_value=Order.objects.none()), \
+                mock.patch.object(connections, 'close_all'):
+            hub.publish([3, 1])
+            event = json.loads(events.get(timeout=5))
+
+        self.assertEqual(event, {'rows': [], 'removed': [1, 3]})
+
+
+@override_settings(
+    GEOCODER_BACKEND='address_and_places.geocoder.StubGeocoder',
+    GEOCODE_IN_BACKGROUND=False,
+)
+class ManagerPagesQueryCountTest(TestCase):
+    """Число запросов у страниц менеджера не зависит от числа заказов."""
+    orders_count = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        generator = random.Random(0)
+        products, _ = create_catalogue(10, 50, menu_coverage=1, generator=generator)
+        addresses = create_addresses(200, generator=generator)
+        create_orders(cls.orders_count, products, addresses, generator=generator)
+        cls.manager = get_user_model().objects.create(username='manager', is_staff=True)
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def test_view_orders(self):
+        # Кэши процесса прогреваются первым запросом, считается второй.
+        self.client.get('/manager/orders/')
+        # Сессия, менеджер, заказы и позиции заказов.
+        with self.assertNumQueries(4):
+            response = self.client.get('/manager/orders/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_view_products(self):
+        # Сессия, менеджер, страница товаров, число товаров, рестораны и меню.
+        with self.assertNumQueries(6):
+            response = self.client.get('/manager/products/')
+        self.assertEqual(response.status_code, 200)
+
+
+class ManagerPagesQueryCount1000Test(ManagerPagesQueryCountTest):
+    orders_count = 1000
+
+
+class ManagerPagesQueryCount10000Test(ManagerPagesQueryCountTest):
+    orders_count = 10000
+
+
+@override_settings(PRODUCTS_PAGE_SIZE=4, PRODUCTS_RESTAURANT_COLUMNS=3)
+class ProductsPageTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_catalogue(7, 10, menu_coverage=0.5, generator=random.Random(0))
+        menu_item_ids = RestaurantMenuItem.objects.order_by('id').values_list('id', flat=True)
+        RestaurantMenuItem.objects.filter(id__in=list(menu_item_ids)[::3]).update(availability=False)
+        cls.manager = get_user_model().objects.create(username='manager', is_staff=True)
+        cls.product_ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+        cls.restaurants = list(Restaurant.objects.order_by('name', 'id').values_list('id', 'name'))
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def get_context(self, params):
+        response = self.client.get('/manager/products/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.context
+
+    def test_products_are_paged(self):
+        context = self.get_context({'page': 1})
+        self.assertEqual(
+            [product.id for product, _ in context['products_with_restaurants']], self.product_ids[:4])
+        self.assertIsNone(context['previous_page_url'])
+        self.assertEqual(context['next_page_url'], '?page=2')
+
+        context = self.get_context({'page': 3, 'columns': 3})
+        self.assertEqual(
+            [product.id for product, _ in context['products_with_restaurants']], self.product_ids[8:])
+        self.assertEqual(context['previous_page_url'], '?page=2&columns=3')
+        self.assertIsNone(context['next_page_url'])
+
+    def test_restaurant_columns_are_windowed(self):
+        names = [name for _, name in self.restaurants]
+        for columns, expected_names, first_column in [
+            (None, names[:3], 1),
+            ('3', names[3:6], 4),
+            ('6', names[6:], 7),
+            # Окно за концом списка показывает последний ресторан.
+            ('100', names[6:], 7),
+            ('-5', names[:3], 1),
+            ('много', names[:3], 1),
+        ]:
+            with self.subTest(columns=columns):
+                context = self.get_context({'columns': columns} if columns else {})
+                self.assertEqual(context['restaurants'], expected_names)
+                self.assertEqual(context['first_column'], first_column)
+                self.assertEqual(context['restaurants_count'], 7)
+
+        context = self.get_context({'columns': '3'})
+        self.assertEqual(context['previous_columns_url'], '?columns=0')
+        self.assertEqual(context['next_columns_url'], '?columns=6')
+
+    def test_matrix_matches_menus(self):
+        availability = {
+            (product_id, restaurant_id): available
+            for product_id, restaurant_id, available in RestaurantMenuItem.objects.values_list(
+                'product_id', 'restaurant_id', 'availability')
+        }
+        for page, columns in [(1, 0), (2, 3), (3, 6)]:
+            with self.subTest(page=page, columns=columns):
+                context = self.get_context({'page': page, 'columns': columns})
+                window = self.restaurants[columns:columns + 3]
+                for product, cells in context['products_with_restaurants']:
+                    self.assertEqual(cells, [
+                        availability.get((product.id, restaurant_id), False)
+                        for restaurant_id, _ in window
+                    ])
+
+
+class OrderEventsStreamTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = get_user_model().objects.create(username='manager', is_staff=True)
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    @override_settings(ORDER_EVENTS_STREAM=False)
+    def test_stream_disabled(self):
+        response = self.client.get('/manager/orders/')
+        self.assertNotContains(response, 'data-stream-url')
+
+        response = self.client.get('/manager/orders/stream/')
+        self.assertEqual(response.status_code, 204)
+
+    @override_settings(ORDER_EVENTS_STREAM=True, ORDER_EVENTS_POLL_INTERVAL=60)
+    def test_stream_enabled(self):
+        response = self.client.get('/manager/orders/')
+        self.assertContains(response, 'data-stream-url="/manager/orders/stream/"')
+        self.assertContains(response, 'data-stream-poll-interval="60"')
+
+
+class CompressionTest(TestCase):
+    def test_pages_with_csrf_token_are_not_compressed(self):
+        # Сжатые страницы с CSRF-токеном открыты для атаки BREACH.
+        response = self.client.get('/manager/login/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertFalse(response.has_header('Content-Encoding'))
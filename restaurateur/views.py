@@ -1,21 +1,28 @@
 from django import forms
 from django.shortcuts import redirect, render
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 from django.views import View
 from django.urls import reverse_lazy
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
+from django.core.paginator import Paginator
+from django.contrib import messages
+from django.views.decorators.http import require_POST
+from foodcartapp.assignment import assign_unprocessed_orders
 from foodcartapp.models import Product, Restaurant, Order, OrderItem, RestaurantMenuItem
-import requests
-from geopy.distance import lonlat, distance
-from address_and_places.models import Address
+from .board import get_board_changes, serialize_orders
+from .events import order_events
+from .models import RemovedOrder
 from django.conf import settings
 import logging
+import queue
 from django.core.exceptions import ObjectDoesNotExist
 from urllib.error import HTTPError
-from django.db.models import Sum
-
-YANDEX_GEOCODER_API_TOKEN = settings.YANDEX_GEOCODER_API_TOKEN
+from django.db.models import Prefetch, Q, Sum
+from datetime import datetime, timedelta, timezone as datetime_timezone
 
 
 class Login(forms.Form):
@@ -70,29 +77,72 @@ def is_manager(user):
     return user.is_staff  # FIXME replace with specific permission
 
 
-@user_passes_test(is_manager, login_url='restaurateur:login')
-def view_products(request):
-    restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
+def get_offset(request, name):
+    try:
+        return max(int(request.GET.get(name, 0)), 0)
+    except ValueError:
+        return 0
 
-    default_availability = {restaurant.id: False for restaurant in restaurants}
-    products_with_restaurants = []
-    for product in products:
 
-        availability = {
-            **default_availability,
-            **{item.restaurant_id: item.availability for item in product.menu_items.all()},
-        }
-        orderer_availability = [availability[restaurant.id]
-                                for restaurant in restaurants]
+def get_products_url(request, **params):
+    query = request.GET.copy()
+    for name, value in params.items():
+        query[name] = value
+    return f"?{query.urlencode()}"
 
-        products_with_restaurants.append(
-            (product, orderer_availability)
-        )
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_products(request):
+    products_page = Paginator(
+        Product.objects.select_related('category').order_by('id'),
+        settings.PRODUCTS_PAGE_SIZE,
+    ).get_page(request.GET.get('page'))
+    products = list(products_page)
+
+    # Колонки ресторанов показываются окном, чтобы таблица не росла вширь
+    # вместе с сетью ресторанов.
+    restaurants = list(Restaurant.objects.order_by('name', 'id').values_list('id', 'name'))
+    columns_width = settings.PRODUCTS_RESTAURANT_COLUMNS
+    columns_offset = min(get_offset(request, 'columns'), max(len(restaurants) - 1, 0))
+    restaurants_window = restaurants[columns_offset:columns_offset + columns_width]
+
+    row_of_product = {product.id: row for row, product in enumerate(products)}
+    column_of_restaurant = {
+        restaurant_id: column
+        for column, (restaurant_id, _) in enumerate(restaurants_window)
+    }
+    availability_matrix = [[False] * len(restaurants_window) for _ in products]
+    menu_items = RestaurantMenuItem.objects.filter(
+        product_id__in=row_of_product,
+        restaurant_id__in=column_of_restaurant,
+    ).values_list('product_id', 'restaurant_id', 'availability')
+    for product_id, restaurant_id, availability in menu_items:
+        availability_matrix[row_of_product[product_id]][column_of_restaurant[restaurant_id]] = availability
+
+    previous_page_url = next_page_url = None
+    if products_page.has_previous():
+        previous_page_url = get_products_url(
+            request, page=products_page.previous_page_number())
+    if products_page.has_next():
+        next_page_url = get_products_url(request, page=products_page.next_page_number())
+    previous_columns_url = next_columns_url = None
+    if columns_offset > 0:
+        previous_columns_url = get_products_url(
+            request, columns=max(columns_offset - columns_width, 0))
+    if columns_offset + columns_width < len(restaurants):
+        next_columns_url = get_products_url(request, columns=columns_offset + columns_width)
 
     return render(request, template_name="products_list.html", context={
-        'products_with_restaurants': products_with_restaurants,
-        'restaurants': restaurants,
+        'products_with_restaurants': list(zip(products, availability_matrix)),
+        'restaurants': [name for _, name in restaurants_window],
+        'products_page': products_page,
+        'previous_page_url': previous_page_url,
+        'next_page_url': next_page_url,
+        'previous_columns_url': previous_columns_url,
+        'next_columns_url': next_columns_url,
+        'first_column': columns_offset + 1,
+        'last_column': columns_offset + len(restaurants_window),
+        'restaurants_count': len(restaurants),
     })
 
 
@@ -103,91 +153,115 @@ def view_restaurants(request):
     })
 
 
-def create_geodata_of_place(place):
-    coordinates = fetch_coordinates(YANDEX_GEOCODER_API_TOKEN, place)
-    if coordinates == None:
-        geodata_of_place = Address.objects.get_or_create(address=place)
-        return geodata_of_place
-    longitude, latitude = coordinates
-    geodata_of_place = Address.objects.get_or_create(
-        address=place, longitude=longitude, latitude=latitude)
-    return geodata_of_place
-
-
-def fetch_coordinates(apikey, address):
-    base_url = "https://geocode-maps.yandex.ru/1.x"
-    response = requests.get(base_url, params={
-        "geocode": address,
-        "apikey": apikey,
-        "format": "json",
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_orders(request):
+    cursor = timezone.now()
+    # Заказы читаются один раз, дальше доска работает со списком.
+    orders = list(
+        Order.objects
+        .unprocessed()
+        .select_related("restaurant")
+        .prefetch_related(Prefetch(
+            "items", queryset=OrderItem.objects.only("id", "order_id", "product_id")))
+        .order_by("registrated_at", "id")
+    )
+    return render(request, template_name='order_items.html', context={
+        "serialized_orders": serialize_orders(orders),
+        "cursor": cursor.isoformat(),
+        "poll_interval": settings.ORDER_BOARD_POLL_INTERVAL,
+        "stream_enabled": settings.ORDER_EVENTS_STREAM,
+        "stream_poll_interval": settings.ORDER_EVENTS_POLL_INTERVAL,
     })
-    response.raise_for_status()
-    found_places = response.json(
-    )['response']['GeoObjectCollection']['featureMember']
-
-    if not found_places:
-        return None
-
-    most_relevant = found_places[0]
-    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
-    return lon, lat
 
 
-def check_order_address(order_address, addresses):
-    if order_address not in addresses:
-        new_order_address = create_geodata_of_place(order_address)
-
+@require_POST
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def assign_orders(request):
+    assigned_restaurants = assign_unprocessed_orders()
+    messages.success(request, f"Назначено ресторанов заказам: {len(assigned_restaurants)}")
+    return redirect("restaurateur:view_orders")
 
-def serialize_order(order, addresses_geodata, products_of_restaurants, suitable_restaurants_for_order):
-    restaurants = []
-    order_address = order.address
 
-    for address_geodata in addresses_geodata:
-        if address_geodata.address == order_address:
-            order_address = address_geodata
-            break
+def parse_changes_cursor(cursor):
+    """Разбирает курсор доски заказов: время изменения и id последнего заказа.
 
-    if order_address.latitude or order_address.longitude:
-        for suitable_restaurant in suitable_restaurants_for_order:
-            coordinates_of_restaurant = (suitable_restaurant.longitude, suitable_restaurant.latitude)
-            distance_to_suitable_restaurant = distance(
-                coordinates_of_restaurant, (order_address.longitude, order_address.latitude))
-            restaurant = {"suitable_restaurant": suitable_restaurant,
-                          "distance_to_suitable_restaurant": distance_to_suitable_restaurant}
-            restaurants.append(restaurant)
+    Курсор без id означает, что прошлый ответ вернул все изменения.
+    """
+    timestamp, _, last_id = cursor.partition("|")
+    timestamp = datetime.fromisoformat(timestamp)
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp, datetime_timezone.utc)
+    return timestamp, int(last_id) if last_id else None
 
-    price_of_order = str(order.price)
 
-    restaurants = sorted(restaurants, key=lambda k: k['distance_to_suitable_restaurant'])
-    serialized_order = {"id": order.id, "firstname": order.firstname, "lastname": order.lastname, "phonenumber": order.phonenumber, "address": order.address,
-                 "price_of_order": price_of_order,
-                 "status": order.get_status_display(), "payment_method": order.get_payment_method_display(), "comment": order.comment, "restaurants": restaurants}
-    
-    return serialized_order
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_orders_changes(request):
+    try:
+        cursor, last_id = parse_changes_cursor(request.GET["cursor"])
+    except (KeyError, ValueError):
+        return JsonResponse({"error": "Некорректный курсор"}, status=400)
+
+    next_cursor = timezone.now().isoformat()
+    if last_id is None:
+        # Заказ мог получить updated_at раньше, чем закоммитилась его
+        # транзакция, поэтому окно запроса немного заходит назад за курсор.
+        overlap = timedelta(seconds=settings.ORDER_BOARD_POLL_OVERLAP)
+        changes_filter = Q(updated_at__gte=cursor - overlap)
+        removals_since = cursor - overlap
+    else:
+        # Прошлый ответ упёрся в лимит: продолжаем строго после последнего
+        # заказа, иначе заказы с одинаковым updated_at возвращались бы снова.
+        changes_filter = Q(updated_at__gt=cursor) | Q(updated_at=cursor, id__gt=last_id)
+        removals_since = cursor
+    limit = settings.ORDER_BOARD_CHANGES_LIMIT
+    changed_orders = list(
+        Order.objects
+        .filter(changes_filter)
+        .select_related("restaurant")
+        .prefetch_related("items")
+        .order_by("updated_at", "id")[:limit]
+    )
+    if len(changed_orders) == limit:
+        last_order = changed_orders[-1]
+        next_cursor = f"{last_order.updated_at.isoformat()}|{last_order.id}"
+
+    # Удаления приходят заново, пока курсор их не перешагнёт: убрать
+    # строку, которой уже нет на странице, ничего не стоит.
+    removed_order_ids = list(
+        RemovedOrder.objects
+        .filter(removed_at__gte=removals_since)
+        .values_list("order_id", flat=True)
+        .distinct()
+    )
+    return JsonResponse({
+        **get_board_changes(changed_orders, removed_order_ids),
+        "cursor": next_cursor,
+    })
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
-def view_orders(request):
-    orders = Order.objects.filter(status="UNPR").prefetch_related("items").annotate_price()
-    orders_addresses = list(orders.values_list("address", flat=True))
-    addresses_geodata = Address.objects.filter(address__in=orders_addresses)
-    addresses = list(addresses_geodata.values_list("address", flat=True))
-
-    for order_address in orders_addresses:
-        check_order_address(order_address, addresses)
-
-    products_of_restaurants = Restaurant.objects.get_products_of_restaurants()
-    suitable_restaurants_for_orders = orders.select_suitable_restaurants_for_orders(products_of_restaurants)
-    serialized_orders = []
-
-    for order in orders:
-        for item in suitable_restaurants_for_orders:
-            if item["order_id"] == order.id:
-                suitable_restaurants_for_order = item["suitable_restaurants"]
-                break
-        serialized_order = serialize_order(order, addresses_geodata, products_of_restaurants, suitable_restaurants_for_order)
-        serialized_orders.append(serialized_order)
-        
-    serialized_orders = {"serialized_orders": serialized_orders}
-    return render(request, template_name='order_items.html',
-                  context=serialized_orders)
+def stream_orders(request):
+    if not settings.ORDER_EVENTS_STREAM or isinstance(request, ASGIRequest):
+        # Django 3.2 под ASGI читает потоковый ответ прямо в цикле событий,
+        # и ожидание событий заблокировало бы весь процесс. Ответ 204
+        # переключает страницу заказов на опрос.
+        return HttpResponse(status=204)
+
+    def iter_events():
+        events = order_events.subscribe()
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = events.get(timeout=settings.ORDER_EVENTS_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: orders\ndata: {event}\n\n"
+        finally:
+            order_events.unsubscribe(events)
+
+    response = StreamingHttpResponse(iter_events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
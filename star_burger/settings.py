@@ -9,6 +9,29 @@ env.read_env()
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 YANDEX_GEOCODER_API_TOKEN = env("YANDEX_GEOCODER_API_TOKEN")
+GEOCODER_BACKEND = env(
+    'GEOCODER_BACKEND', 'address_and_places.geocoder.YandexGeocoder')
+GEOCODER_OPTIONS = {}
+GEOCODER_TIMEOUT = env.float('GEOCODER_TIMEOUT', 5)
+GEOCODER_CONCURRENCY = env.int('GEOCODER_CONCURRENCY', 10)
+GEOCODER_RATE_LIMIT = env.float('GEOCODER_RATE_LIMIT', 20)
+GEOCODE_CACHE_TTL = env.int('GEOCODE_CACHE_TTL', 30 * 24 * 60 * 60)
+GEOCODE_NEGATIVE_CACHE_TTL = env.int('GEOCODE_NEGATIVE_CACHE_TTL', 24 * 60 * 60)
+GEOCODE_CACHE_SIZE = env.int('GEOCODE_CACHE_SIZE', 1024)
+GEOCODE_IN_BACKGROUND = env.bool('GEOCODE_IN_BACKGROUND', True)
+GEOCODE_QUEUE_BATCH_SIZE = env.int('GEOCODE_QUEUE_BATCH_SIZE', 100)
+GEOCODE_QUEUE_BATCH_DELAY = env.float('GEOCODE_QUEUE_BATCH_DELAY', 0.5)
+ORDER_RESTAURANTS_LIMIT = env.int('ORDER_RESTAURANTS_LIMIT', 5)
+DISTANCE_GEODESIC_REFINE_TOP = env.int('DISTANCE_GEODESIC_REFINE_TOP', 0)
+PRODUCTS_PAGE_SIZE = env.int('PRODUCTS_PAGE_SIZE', 50)
+PRODUCTS_RESTAURANT_COLUMNS = env.int('PRODUCTS_RESTAURANT_COLUMNS', 20)
+ORDER_BOARD_POLL_INTERVAL = env.int('ORDER_BOARD_POLL_INTERVAL', 10)
+ORDER_BOARD_POLL_OVERLAP = env.int('ORDER_BOARD_POLL_OVERLAP', 5)
+ORDER_BOARD_CHANGES_LIMIT = env.int('ORDER_BOARD_CHANGES_LIMIT', 500)
+ORDER_EVENTS_KEEPALIVE = env.int('ORDER_EVENTS_KEEPALIVE', 15)
+ORDER_EVENTS_STREAM = env.bool('ORDER_EVENTS_STREAM', False)
+ORDER_EVENTS_POLL_INTERVAL = env.int('ORDER_EVENTS_POLL_INTERVAL', 60)
+ORDER_ARCHIVE_AFTER_DAYS = env.int('ORDER_ARCHIVE_AFTER_DAYS', 90)
 
 SECRET_KEY = env('SECRET_KEY', 'etirgvonenrfnoerngorenogneongg334g')
 DEBUG = env.bool('DEBUG', True)
@@ -25,10 +48,11 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'debug_toolbar',
     'phonenumber_field',
     'rest_framework',
 ]
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -38,8 +62,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
+if DEBUG:
+    # Middleware debug_toolbar умеет работать только синхронно и в
+    # ASGI-режиме заставил бы Django выполнять асинхронные view в потоке.
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
+API_PRETTY_JSON = env.bool('API_PRETTY_JSON', False)
+BULK_ORDERS_MAX_SIZE = env.int('BULK_ORDERS_MAX_SIZE', 1000)
 
 ROOT_URLCONF = 'star_burger.urls'
 
@@ -77,6 +107,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'star_burger.wsgi.application'
+ASGI_APPLICATION = 'star_burger.asgi.application'
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', False)
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
@@ -87,6 +119,10 @@ DATABASES = {
     )
 }
 
+CACHES = {
+    'default': env.dj_cache_url('CACHE_URL', 'locmem://'),
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',